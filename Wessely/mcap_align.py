@@ -0,0 +1,129 @@
+from typing import Optional
+
+import numpy as np
+
+from mcap_export import SLOT_NS
+
+ALIGN_METHODS = ("asof", "mean", "interpolate")
+
+
+def make_grid(arrays, step_ns: int = SLOT_NS):
+    """
+    Returns a time grid of step_ns covering the ts of all structured arrays,
+    starting at the multiple of step_ns before the first sample like the slots of mcap_export.
+    """
+    starts = [int(x['ts'].min()) for x in arrays if len(x)]
+    ends = [int(x['ts'].max()) for x in arrays if len(x)]
+    if not starts:
+        return np.zeros((0,), dtype=np.uint64)
+    start = min(starts) // step_ns * step_ns
+    return np.arange(start, max(ends) + 1, step_ns, dtype=np.uint64)
+
+
+def _asof_index(ts, grid, tolerance: Optional[int]):
+    """
+    Returns the index of the last sample at or before every grid point and a mask of the valid ones,
+    samples older than tolerance ns are not used.
+    """
+    idx = np.searchsorted(ts, grid, side='right') - 1
+    valid = idx >= 0
+    if tolerance is not None:
+        valid &= (grid.astype(np.int64) - ts[np.maximum(idx, 0)].astype(np.int64)) <= tolerance
+    return np.maximum(idx, 0), valid
+
+
+def _align_values(ts, values, grid, method: str, tolerance: Optional[int]):
+    """
+    Returns the numeric values of one field on the grid as float64, NaN where there is no sample.
+    """
+    values = values.astype(np.float64)
+    out = np.full(grid.shape, np.nan)
+    if not len(ts):
+        return out
+
+    if method == "asof":
+        idx, valid = _asof_index(ts, grid, tolerance)
+        out[valid] = values[idx[valid]]
+
+    elif method == "mean":
+        # mean of the samples from one grid point to the next, the last interval is as long as the one before
+        step = int(grid[-1] - grid[-2]) if len(grid) > 1 else SLOT_NS
+        bucket = np.searchsorted(grid, ts, side='right') - 1
+        inside = (bucket >= 0) & (ts < grid[-1] + np.uint64(step))
+        counts = np.bincount(bucket[inside], minlength=len(grid))
+        sums = np.bincount(bucket[inside], weights=values[inside], minlength=len(grid))
+        np.divide(sums, counts, out=out, where=counts > 0)
+
+    else:
+        # linear interpolation between the samples before and after every grid point
+        idx, valid = _asof_index(ts, grid, tolerance)
+        next_idx = np.minimum(idx + 1, len(ts) - 1)
+        exact = valid & (ts[idx] == grid)
+        valid &= next_idx > idx
+        if tolerance is not None:
+            valid &= (ts[next_idx].astype(np.int64) - grid.astype(np.int64)) <= tolerance
+
+        t0 = ts[idx].astype(np.float64)
+        dt = ts[next_idx].astype(np.float64) - t0
+        frac = np.divide(grid.astype(np.float64) - t0, dt, out=np.zeros(grid.shape), where=dt > 0)
+        interpolated = values[idx] + frac * (values[next_idx] - values[idx])
+        out[valid] = interpolated[valid]
+        out[exact] = values[idx[exact]]
+
+    return out
+
+
+def align_arrays(arrays, grid=SLOT_NS, method: str = "asof", tolerance: Optional[int] = None, value_fields=None,
+                 validity=None):
+    """
+    Joins structured arrays, e.g. the topics of McapReader.get_data, onto one time grid and returns
+    one wide structured array with ts (the grid) and a field <name>_<field> per input field:
+        asof: the last sample at or before the grid point, at most tolerance ns old
+        mean: the mean of the samples from the grid point to the next one
+        interpolate: linear interpolation between the samples around the grid point,
+                     both at most tolerance ns away
+    arrays is a dictionary of name to structured array with ts, grid is a step in ns (default 15 minutes,
+    see make_grid) or an array of sorted ts. Value fields (default: numeric fields) become float64 with NaN
+    where there is no sample, other fields, e.g. strings, always take the as-of sample.
+    validity optionally gives the valid rows of value fields as dictionary of name to dictionary of field name
+    to bool array (see McapTopic.get_validity), invalid values are left out as if there was no sample.
+    """
+    if method not in ALIGN_METHODS:
+        raise ValueError(f"Unknown align method {method}, use one of {ALIGN_METHODS}")
+
+    if np.ndim(grid) == 0:
+        grid = make_grid(list(arrays.values()), int(grid))
+    grid = np.asarray(grid, dtype=np.uint64)
+
+    np_struct_format = [('ts', np.uint64)]
+    columns = {'ts': grid}
+    for name, data in arrays.items():
+        ts = data['ts']
+        order = None
+        if len(ts) > 1 and np.any(ts[1:] < ts[:-1]):
+            order = np.argsort(ts, kind='stable')
+            ts = ts[order]
+
+        fields = [x for x in data.dtype.names if x != "ts"]
+        numeric = [x for x in fields if data.dtype[x].kind in "iufb"] if value_fields is None else value_fields[name]
+        idx, valid = _asof_index(ts, grid, tolerance) if len(ts) else (None, np.zeros(grid.shape, np.bool_))
+
+        for field in fields:
+            values = data[field] if order is None else data[field][order]
+            key = name.replace("/", "_") + "_" + field
+            if field in numeric:
+                field_ts = ts
+                if validity is not None and field in validity.get(name, {}):
+                    field_valid = validity[name][field] if order is None else validity[name][field][order]
+                    field_ts = ts[field_valid]
+                    values = values[field_valid]
+                columns[key] = _align_values(field_ts, values, grid, method, tolerance)
+            else:
+                columns[key] = np.zeros(grid.shape, dtype=values.dtype)
+                columns[key][valid] = values[idx[valid]]
+            np_struct_format.append((key, columns[key].dtype))
+
+    out = np.zeros(grid.shape, dtype=np_struct_format)
+    for key, column in columns.items():
+        out[key] = column
+    return out
@@ -0,0 +1,195 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from mcap_reader import McapReader
+
+# cases of run_benchmark_suite in the order they are run, later cases use the cache of cold_decode
+BENCHMARK_CASES = ("cold_decode", "cached_load", "get_data_list", "csv_export")
+
+
+def _time_decoder(decoder, np_struct_format, repeat):
+    """
+    Runs the decoder repeat times and returns the best wall time and the decoded data.
+    """
+    best = None
+    data = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = decoder(np_struct_format)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, data
+
+
+def _time_read(topic, repeat):
+    """
+    Returns the best wall time of only iterating the messages of a topic without decoding them.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in topic._iter_message_blocks():
+            pass
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def compare_default_decoders(mcap_path: str, repeat: int = 3):
+    """
+    Compares the throughput of the block decoders McapTopic.get_default_data and get_oscilloscope_data
+    against the per-message decoders get_default_data_old and get_oscilloscope_data_old for every topic.
+    The decode throughput excludes the time spent reading messages from the mcap file.
+    Returns a list of result dicts and prints a short table.
+    """
+    mcap_reader = McapReader()
+    mcap_reader.open(mcap_path)
+
+    results = []
+    for topic_name in mcap_reader.get_topics():
+        if topic_name not in mcap_reader._topic_lut:
+            continue
+
+        topic = mcap_reader.get_topic(topic_name)
+        np_struct_format = topic.get_np_struct_format()
+        count = topic.get_message_count()
+
+        if "oscilloscope" in topic_name:
+            old_decoder, new_decoder = topic.get_oscilloscope_data_old, topic.get_oscilloscope_data
+        else:
+            old_decoder, new_decoder = topic.get_default_data_old, topic.get_default_data
+
+        old_time, old_data = _time_decoder(old_decoder, np_struct_format, repeat)
+        new_time, new_data = _time_decoder(new_decoder, np_struct_format, repeat)
+        read_time = _time_read(topic, repeat)
+        print()
+
+        results.append({
+            "topic": topic_name,
+            "messages": count,
+            "old_msgs_per_s": count / old_time,
+            "new_msgs_per_s": count / new_time,
+            "speedup": old_time / new_time,
+            "old_decode_msgs_per_s": count / max(old_time - read_time, 1e-9),
+            "new_decode_msgs_per_s": count / max(new_time - read_time, 1e-9),
+            "identical": old_data.tobytes() == new_data.tobytes(),
+        })
+
+    mcap_reader.close()
+
+    print("topic | messages | old msg/s | new msg/s | speedup | old decode msg/s | new decode msg/s | identical")
+    for r in results:
+        print(f"{r['topic']} | {r['messages']} | {r['old_msgs_per_s']:.0f} | {r['new_msgs_per_s']:.0f} | "
+              f"{r['speedup']:.2f}x | {r['old_decode_msgs_per_s']:.0f} | {r['new_decode_msgs_per_s']:.0f} | "
+              f"{r['identical']}")
+
+    return results
+
+
+def _peak_rss_mb():
+    """
+    Returns the peak resident set size of this process in MB, or None if it cannot be measured.
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        memory_info = psutil.Process().memory_info()
+        return getattr(memory_info, "peak_wset", memory_info.rss) / 2 ** 20
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def _run_case(case: str, mcap_path: str, work_dir: str):
+    """
+    Runs one benchmark case in a fresh process, so the peak RSS belongs to this case only.
+    Returns the wall time, the mcap messages processed, the decode metrics and the peak RSS before and after.
+    """
+    rss_before = _peak_rss_mb()
+    mcap_reader = McapReader()
+    mcap_reader.open(mcap_path, os.path.join(work_dir, "numpy"))
+    mcap_reader.set_progress(None)
+    topics = [x for x in mcap_reader.get_topics() if x in mcap_reader._topic_lut]
+
+    if case == "get_data_list":
+        topics = [x for x in topics if "oscilloscope" not in x]
+    messages = sum(mcap_reader.get_topic(x).get_message_count() for x in topics)
+
+    start = time.perf_counter()
+    if case == "csv_export":
+        from mcap_export import export_topics_csv
+        export_topics_csv(mcap_reader, os.path.join(work_dir, "csv"), workers=1)
+    elif case == "get_data_list":
+        for topic in topics:
+            mcap_reader.get_data_list(topic)
+    else:
+        for topic in topics:
+            mcap_reader.get_data(topic)
+    elapsed = time.perf_counter() - start
+
+    metrics = mcap_reader.get_metrics().get_summary()
+    mcap_reader.close()
+    return elapsed, messages, metrics, rss_before, _peak_rss_mb()
+
+
+def run_benchmark_suite(mcap_path: str, cases=BENCHMARK_CASES, work_dir: Optional[str] = None):
+    """
+    Measures the throughput and peak RSS of reading a whole mcap file:
+        cold_decode: McapReader.get_data of every topic without cache
+        cached_load: McapReader.get_data of every topic from the numpy cache (memory mapped, read on access)
+        get_data_list: McapReader.get_data_list of every non-oscilloscope topic
+        csv_export: mcap_export.export_topics_csv of all topics
+    Every case runs in its own process. Caches are written to work_dir (default: a temporary directory).
+    Returns a list of result dicts and prints a short table. Generate large files with mcap_generator.py.
+    """
+    temp_dir = tempfile.mkdtemp() if work_dir is None else None
+    work_dir = temp_dir if work_dir is None else work_dir
+    shutil.rmtree(os.path.join(work_dir, "numpy"), ignore_errors=True)
+    file_size = os.path.getsize(mcap_path)
+
+    results = []
+    try:
+        for case in cases:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                elapsed, messages, metrics, rss_before, peak_rss = pool.submit(_run_case, case, mcap_path,
+                                                                               work_dir).result()
+            results.append({
+                "case": case,
+                "seconds": elapsed,
+                "messages": messages,
+                "msgs_per_s": messages / elapsed,
+                "file_mb_per_s": file_size / 2 ** 20 / elapsed,
+                "stage_seconds": metrics["stage_seconds"],
+                "rss_before_mb": rss_before,
+                "peak_rss_mb": peak_rss,
+            })
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print(f"{Path(mcap_path).name}: {file_size / 2 ** 20:.1f} MB")
+    print("case | seconds | messages | msg/s | file MB/s | peak RSS MB")
+    for r in results:
+        peak_rss = "n/a" if r["peak_rss_mb"] is None else f"{r['peak_rss_mb']:.0f}"
+        print(f"{r['case']} | {r['seconds']:.3f} | {r['messages']} | {r['msgs_per_s']:.0f} | "
+              f"{r['file_mb_per_s']:.1f} | {peak_rss}")
+
+    return results
+
+
+if __name__ == '__main__':
+    default_path = Path(__file__).parent / "ShellyData" / "ShellyPro3EM.mcap"
+    mcap_file = sys.argv[1] if len(sys.argv) > 1 else str(default_path)
+    compare_default_decoders(mcap_file)
+    run_benchmark_suite(mcap_file)
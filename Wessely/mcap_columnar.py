@@ -0,0 +1,184 @@
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from mcap_reader import McapReader, McapTopic, DECODE_BLOCK_SIZE, _prepare_cache_dir, _write_manifest
+
+NS_PER_DAY = 24 * 3600 * 10 ** 9
+
+
+def _day_name(day: int):
+    """
+    Returns the partition folder name (UTC date) of a day number since the epoch.
+    """
+    return str(np.datetime64(int(day), 'D'))
+
+
+class ColumnarCache:
+    """
+    Decoded data of one topic stored as one compressed file per column and day:
+        <cache_dir>/<YYYY-MM-DD>/<field>.npz
+        <cache_dir>/manifest.json
+    A single column or date range is loaded without reading the rest of the topic.
+    """
+    def __init__(self, cache_dir: Path):
+        self._cache_dir = Path(cache_dir)
+        with open(self._cache_dir / "manifest.json", 'r') as f:
+            self._manifest = json.load(f)
+        self._np_struct_format = [(x[0], np.dtype(x[1])) for x in self._manifest["fields"]]
+
+    def get_manifest(self):
+        return self._manifest
+
+    def get_fields(self):
+        return [x[0] for x in self._np_struct_format]
+
+    def get_categories(self):
+        """
+        Returns the dictionaries of dictionary encoded string fields, see McapTopic.get_categories.
+        """
+        return {k: np.array([x.encode('latin-1') for x in v], dtype="S80")
+                for k, v in self._manifest.get("categories", {}).items()}
+
+    def get_days(self):
+        return list(self._manifest["days"].keys())
+
+    def get_message_count(self):
+        return sum(self._manifest["days"].values())
+
+    def load(self, fields=None, start_ns: Optional[int] = None, end_ns: Optional[int] = None):
+        """
+        Returns the given fields plus ts of the messages with start_ns <= ts < end_ns as structured array.
+        Only the files of the requested columns and days are read.
+        """
+        known = dict(self._np_struct_format)
+        fields = [x for x in (known if fields is None else fields) if x != "ts"]
+        np_struct_format = [(x, known[x]) for x in fields] + [('ts', known['ts'])]
+
+        first_day = None if start_ns is None else start_ns // NS_PER_DAY
+        last_day = None if end_ns is None else (end_ns - 1) // NS_PER_DAY
+        days = [x for x in self.get_days()
+                if (first_day is None or x >= _day_name(first_day)) and (last_day is None or x <= _day_name(last_day))]
+
+        parts = []
+        for day in days:
+            columns = {}
+            for field, _ in np_struct_format:
+                with np.load(self._cache_dir / day / (field + ".npz")) as npz:
+                    columns[field] = npz["data"]
+
+            ts = columns["ts"]
+            mask = np.ones(ts.shape, dtype=np.bool_)
+            if start_ns is not None:
+                mask &= ts >= start_ns
+            if end_ns is not None:
+                mask &= ts < end_ns
+
+            part = np.zeros((int(np.count_nonzero(mask)),), dtype=np_struct_format)
+            for field, column in columns.items():
+                part[field] = column[mask]
+            parts.append(part)
+
+        if not parts:
+            return np.zeros((0,), dtype=np_struct_format)
+
+        return np.concatenate(parts)
+
+    def load_dataframe(self, fields=None, start_ns: Optional[int] = None, end_ns: Optional[int] = None):
+        """
+        Returns the result of load as pandas DataFrame with ts as datetime index.
+        """
+        import pandas as pd
+
+        data = self.load(fields, start_ns, end_ns)
+        index = pd.DatetimeIndex(data['ts'].astype('datetime64[ns]'), name="ts")
+        return pd.DataFrame({x: data[x] for x in data.dtype.names if x != "ts"}, index=index)
+
+
+def _read_partition(day_dir: Path, dtype):
+    """
+    Reads all columns of one day partition into a structured array of the given dtype.
+    """
+    data = None
+    for field in dtype.names:
+        with np.load(day_dir / (field + ".npz")) as npz:
+            column = npz["data"]
+        if data is None:
+            data = np.zeros((len(column),), dtype=dtype)
+        data[field] = column
+    return data
+
+
+def _write_day(cache_dir: Path, day: int, parts):
+    """
+    Writes the rows of one day as one compressed file per column, appending to an existing partition.
+    """
+    day_dir = cache_dir / _day_name(day)
+    if os.path.exists(day_dir):
+        parts = [_read_partition(day_dir, parts[0].dtype)] + parts
+    data = np.concatenate(parts)
+
+    os.makedirs(day_dir, exist_ok=True)
+    for field in data.dtype.names:
+        np.savez_compressed(day_dir / (field + ".npz"), data=data[field])
+
+    return len(data)
+
+
+def build_columnar_cache(mcap_topic: McapTopic, cache_dir: Path, batch_size: int = DECODE_BLOCK_SIZE * 16):
+    """
+    Decodes a topic batch by batch into a columnar cache in cache_dir, replacing an existing one
+    (see _prepare_cache_dir).
+    Days are written as soon as a batch starts a later day, so memory stays bounded for ordered data.
+    """
+    cache_dir = Path(cache_dir)
+    _prepare_cache_dir(cache_dir)
+
+    days = {}
+    buffered = {}
+    dtype = np.dtype(mcap_topic.get_np_struct_format())
+    for batch in mcap_topic.iter_batches(batch_size):
+        dtype = batch.dtype
+        batch_days = batch['ts'] // NS_PER_DAY
+        for day in np.unique(batch_days):
+            buffered.setdefault(int(day), []).append(batch[batch_days == day])
+
+        # write all days before the last day of the batch
+        for day in sorted(buffered):
+            if day < int(batch_days.max()):
+                days[_day_name(day)] = _write_day(cache_dir, day, buffered.pop(day))
+
+    for day in sorted(buffered):
+        days[_day_name(day)] = _write_day(cache_dir, day, buffered.pop(day))
+
+    manifest = mcap_topic._cache_manifest()
+    manifest["fields"] = [(x, dtype[x].str) for x in dtype.names]
+    manifest["categories"] = mcap_topic._categories
+    manifest["days"] = {k: days[k] for k in sorted(days)}
+
+    _write_manifest(cache_dir, manifest)
+
+    return ColumnarCache(cache_dir)
+
+
+def get_columnar_cache(mcap_reader: McapReader, topic: str, cache_dir: Optional[str] = None):
+    """
+    Returns the columnar cache of a topic, building it if missing or stale.
+    Default cache_dir is columnar/<topic> next to the mcap file.
+    """
+    mcap_topic = mcap_reader.get_topic(topic)
+    if cache_dir is None:
+        cache_dir = mcap_topic._mcap_folder / "columnar" / topic
+    cache_dir = Path(cache_dir)
+
+    manifest_file = cache_dir / "manifest.json"
+    if os.path.exists(manifest_file):
+        cache = ColumnarCache(cache_dir)
+        manifest = {k: v for k, v in cache.get_manifest().items() if k not in ("fields", "days", "categories")}
+        if manifest == mcap_topic._cache_manifest():
+            return cache
+
+    return build_columnar_cache(mcap_topic, cache_dir)
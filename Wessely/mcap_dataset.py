@@ -0,0 +1,202 @@
+import glob
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from mcap_reader import McapReader, DECODE_BLOCK_SIZE
+
+
+def _to_format(data, np_struct_format):
+    """
+    Copies a structured array into the given format, fields missing in data stay 0.
+    """
+    out = np.zeros((len(data),), dtype=np_struct_format)
+    for field in data.dtype.names:
+        if field in out.dtype.names:
+            out[field] = data[field]
+    return out
+
+
+def _merge_by_ts(arrays):
+    """
+    Merges structured arrays sorted by ts into one array sorted by ts.
+    Messages with equal ts keep the order of the arrays.
+    """
+    if not arrays:
+        return None
+    data = np.concatenate(arrays)
+    return data[np.argsort(data['ts'], kind='stable')]
+
+
+class McapDataset:
+    """
+    Reads a set of mcap files, e.g. per-day recordings, as if they were one file.
+    Every file keeps its own numpy cache in numpy/<file name>/ next to it,
+    so adding a file only decodes the new file.
+    """
+    def __init__(self):
+        self._readers = {}
+        self._topic_files = {}
+        self._np_struct_formats = {}
+
+    def open(self, path: str):
+        """
+        Opens all .mcap files of a directory or all files matching a glob pattern.
+        """
+        if Path(path).is_dir():
+            mcap_paths = sorted(Path(path).glob("*.mcap"))
+        else:
+            mcap_paths = sorted(Path(x) for x in glob.glob(path))
+
+        if not mcap_paths:
+            raise FileNotFoundError(f"No mcap files found for {path}")
+
+        for mcap_path in mcap_paths:
+            mcap_reader = McapReader()
+            mcap_reader.open(str(mcap_path), str(mcap_path.parent / "numpy" / mcap_path.stem))
+            self._readers[mcap_path] = mcap_reader
+
+        # order files by their first message, so merged topics mostly come as consecutive runs
+        start_times = {k: v._summary.statistics.message_start_time for k, v in self._readers.items()}
+        self._readers = {k: self._readers[k] for k in sorted(self._readers, key=lambda x: (start_times[x], x))}
+
+        for mcap_path, mcap_reader in self._readers.items():
+            for topic in mcap_reader.get_topics():
+                if topic not in mcap_reader._topic_lut:
+                    continue
+                self._topic_files.setdefault(topic, []).append(mcap_path)
+                self._add_struct_format(topic, mcap_reader.get_topic(topic))
+
+    def _add_struct_format(self, topic: str, mcap_topic):
+        """
+        Adds the fields of a topic in one file to the unified format of the topic over all files.
+        """
+        np_struct_format = self._np_struct_formats.setdefault(topic, [])
+        known = dict(np_struct_format)
+        for field, dtype in mcap_topic.get_np_struct_format():
+            if field not in known:
+                np_struct_format.append((field, dtype))
+            elif np.dtype(known[field]) != np.dtype(dtype):
+                raise ValueError(f"Field {field} of topic {topic} has different types in the mcap files")
+
+        # keep ts as last field like McapTopic
+        np_struct_format.sort(key=lambda x: x[0] == "ts")
+
+    def close(self):
+        for mcap_reader in self._readers.values():
+            mcap_reader.close()
+
+    def get_files(self):
+        return list(self._readers.keys())
+
+    def get_topics(self):
+        return list(self._topic_files.keys())
+
+    def get_total_message_count(self):
+        return sum(x.get_total_message_count() for x in self._readers.values())
+
+    def get_np_struct_format(self, topic: str, fields=None):
+        """
+        Returns the unified numpy structured array format of a topic, optionally only the given fields plus ts.
+        """
+        np_struct_format = self._np_struct_formats[topic]
+        if fields is None:
+            return list(np_struct_format)
+        known = dict(np_struct_format)
+        return [(x, known[x]) for x in fields if x != "ts"] + [('ts', np.uint64)]
+
+    def _file_fields(self, topic: str, mcap_path: Path, np_struct_format):
+        """
+        Returns the fields of a format that the topic has in one file, _to_format fills in the others.
+        """
+        known = {x[0] for x in self._readers[mcap_path].get_topic(topic).get_np_struct_format()}
+        return [x[0] for x in np_struct_format if x[0] in known]
+
+    def _files_in_range(self, topic: str, start_ns: Optional[int], end_ns: Optional[int]):
+        """
+        Returns the files holding the topic whose message time range overlaps the window.
+        """
+        files = []
+        for mcap_path in self._topic_files[topic]:
+            statistics = self._readers[mcap_path]._summary.statistics
+            if start_ns is not None and statistics.message_end_time < start_ns:
+                continue
+            if end_ns is not None and statistics.message_start_time >= end_ns:
+                continue
+            files.append(mcap_path)
+        return files
+
+    def get_data(self, topic: str, start_ns: Optional[int] = None, end_ns: Optional[int] = None, fields=None):
+        """
+        Returns the topic data of all files merged by ts, see McapReader.get_data for the arguments.
+        Each file is loaded from its own cache or decoded and cached.
+        """
+        np_struct_format = self.get_np_struct_format(topic, fields)
+        arrays = []
+        for mcap_path in self._files_in_range(topic, start_ns, end_ns):
+            if start_ns is None and end_ns is None and fields is None:
+                data = self._readers[mcap_path].get_data(topic)
+            else:
+                data = self._readers[mcap_path].get_data(topic, start_ns=start_ns, end_ns=end_ns,
+                                                         fields=self._file_fields(topic, mcap_path, np_struct_format))
+            arrays.append(_to_format(data, np_struct_format))
+
+        data = _merge_by_ts(arrays)
+        return np.zeros((0,), dtype=np_struct_format) if data is None else data
+
+    def iter_batches(self, topic: str, batch_size: int = DECODE_BLOCK_SIZE, fields=None):
+        """
+        Yields the topic data of all files as a lazy k-way merge by ts in batches of batch_size messages.
+        Only about one batch per file is held in memory, see McapTopic.iter_batches.
+        Like get_data it expects the data of every file to be sorted by ts.
+        """
+        np_struct_format = self.get_np_struct_format(topic, fields)
+        iterators = [self._readers[x].iter_batches(topic, batch_size, self._file_fields(topic, x, np_struct_format))
+                     for x in self._topic_files[topic]]
+        buffers = [np.zeros((0,), dtype=np_struct_format) for _ in iterators]
+        pending = np.zeros((0,), dtype=np_struct_format)
+
+        while True:
+            # refill empty buffers, mark exhausted files
+            for idx in range(len(iterators)):
+                while iterators[idx] is not None and len(buffers[idx]) == 0:
+                    batch = next(iterators[idx], None)
+                    if batch is None:
+                        iterators[idx] = None
+                    else:
+                        buffers[idx] = _to_format(batch, np_struct_format)
+
+            active = [idx for idx, x in enumerate(iterators) if x is not None]
+            if not active:
+                break
+
+            # all rows up to the smallest buffered last ts of the files can be merged safely
+            bound = min(buffers[idx]['ts'][-1] for idx in active)
+            ready = [pending]
+            for idx in active:
+                split = np.searchsorted(buffers[idx]['ts'], bound, side='right')
+                ready.append(buffers[idx][:split])
+                buffers[idx] = buffers[idx][split:]
+            pending = _merge_by_ts(ready)
+
+            while len(pending) >= batch_size:
+                yield pending[:batch_size]
+                pending = pending[batch_size:]
+
+        while len(pending):
+            yield pending[:batch_size]
+            pending = pending[batch_size:]
+
+    def print_info(self):
+        info = "MCAP Dataset Info:\n"
+        info += "  Files: " + str(len(self._readers)) + "\n"
+        info += "  Total Messages: " + str(self.get_total_message_count()) + "\n"
+        info += "  Topics:\n"
+
+        for topic, mcap_paths in self._topic_files.items():
+            info += "    " + topic + ":\n"
+            info += "      Files: " + str(len(mcap_paths)) + "\n"
+            info += "      Fields: " + str([x[0] for x in self._np_struct_formats[topic]]) + "\n"
+
+        print(info)
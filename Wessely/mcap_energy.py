@@ -0,0 +1,144 @@
+import datetime
+import sys
+from typing import Optional
+
+import numpy as np
+
+from mcap_export import SLOT_NS, NS_PER_HOUR, DEFAULT_MAX_GAP_NS, _slot_energy
+from mcap_reader import OFFLINE_VALUE
+
+# Shelly field of the active power of a device in W, the device name is the field name without it
+POWER_SUFFIX = "_total_act_power"
+
+# column of the total load like the Summary sheets of the dCEO workbooks
+LOAD_PROFILE_COLUMN = "Load Profile [kW]"
+
+
+def get_power_fields(mcap_reader, topics=None):
+    """
+    Returns the active power fields of the Shelly devices as dictionary of device name to (topic, field).
+    A device found in several topics is named <topic>_<device> in all but the first.
+    """
+    if topics is None:
+        topics = [x for x in mcap_reader.get_topics() if x in mcap_reader._topic_lut]
+
+    power_fields = {}
+    for topic in topics:
+        for field in mcap_reader.get_topic(topic).get_fields():
+            if not field.endswith(POWER_SUFFIX):
+                continue
+            device = field[:-len(POWER_SUFFIX)]
+            if device in power_fields:
+                device = topic.replace("/", "_") + "_" + device
+            power_fields[device] = (topic, field)
+    return power_fields
+
+
+def integrate_power(ts, power, slot_ids, slot_ns: int = SLOT_NS, max_gap_ns: Optional[int] = DEFAULT_MAX_GAP_NS,
+                    valid=None):
+    """
+    Integrates one power series (sorted by ts) over the given slots with the trapezoidal rule.
+    Returns the energy per slot in power unit * hours and the covered fraction of every slot.
+    Invalid samples (see McapTopic.get_validity, default: OFFLINE_VALUE and NaN) and segments between samples
+    more than max_gap_ns apart are not integrated.
+    """
+    boundaries = np.append(slot_ids, slot_ids[-1] + 1).astype(np.int64) * slot_ns
+    if valid is None:
+        valid = power != OFFLINE_VALUE
+    # NaN would spread through the cumulative integral, also for caches validated by OFFLINE_VALUE only
+    valid = valid & ~np.isnan(power)
+    ts = ts[valid]
+    power = power[valid]
+    if len(ts) < 2:
+        return np.zeros(slot_ids.shape), np.zeros(slot_ids.shape)
+
+    # the integral of 1 is the covered time
+    energy = _slot_energy(ts, power, boundaries, max_gap_ns)
+    coverage = _slot_energy(ts, np.ones(power.shape), boundaries, max_gap_ns) * NS_PER_HOUR / slot_ns
+    return energy, coverage
+
+
+def energy_profiles(mcap_reader, topics=None, slot_ns: int = SLOT_NS, max_gap_ns: Optional[int] = DEFAULT_MAX_GAP_NS,
+                    start_ns: Optional[int] = None, end_ns: Optional[int] = None):
+    """
+    Integrates the active power (W) of every Shelly device (see get_power_fields) over the actual sample times
+    into consecutive slots of slot_ns (default 15 minutes). Returns the slot starts in ns and a dictionary of
+    device name to (mean power in kW, energy in kWh, covered fraction) arrays per slot.
+    The mean power is the energy over the covered time of the slot, the energy is extrapolated from it
+    to the full slot, both are NaN for slots without any coverage.
+    """
+    power_fields = get_power_fields(mcap_reader, topics)
+    series = {}
+    for device, (topic, field) in power_fields.items():
+        # the cached data and its validity bitmap, no scan for offline values
+        mcap_topic = mcap_reader.get_topic(topic)
+        data = mcap_topic.get_data()
+        valid = mcap_topic.get_validity([field])[field]
+        mask = np.ones((len(data),), dtype=np.bool_)
+        if start_ns is not None:
+            mask &= data['ts'] >= start_ns
+        if end_ns is not None:
+            mask &= data['ts'] < end_ns
+        ts = data['ts'][mask]
+        order = np.argsort(ts, kind='stable')
+        series[device] = (ts[order], data[field][mask][order].astype(np.float64), valid[mask][order])
+
+    starts = [int(x[0][0]) // slot_ns for x in series.values() if len(x[0])]
+    ends = [int(x[0][-1]) // slot_ns for x in series.values() if len(x[0])]
+    if not starts:
+        return np.zeros((0,), dtype=np.uint64), {}
+    slot_ids = np.arange(min(starts), max(ends) + 1, dtype=np.int64)
+
+    profiles = {}
+    slot_hours = slot_ns / NS_PER_HOUR
+    for device, (ts, power, valid) in series.items():
+        energy, coverage = integrate_power(ts, power, slot_ids, slot_ns, max_gap_ns, valid)
+        mean_kw = np.full(slot_ids.shape, np.nan)
+        np.divide(energy / 1000, coverage * slot_hours, out=mean_kw, where=coverage > 0)
+        profiles[device] = (mean_kw, mean_kw * slot_hours, coverage)
+
+    return (slot_ids * slot_ns).astype(np.uint64), profiles
+
+
+def get_load_profile(mcap_reader, topics=None, slot_ns: int = SLOT_NS,
+                     max_gap_ns: Optional[int] = DEFAULT_MAX_GAP_NS, start_ns: Optional[int] = None,
+                     end_ns: Optional[int] = None):
+    """
+    Returns the energy profiles (see energy_profiles) as pandas DataFrame in the layout of the Summary sheets
+    read by dCEO_Preassessment.ipynb: DateTime (local slot start), Load Profile [kW] and Load Profile [kWh]
+    summed over all devices (NaN for slots no device covers), Coverage (mean covered fraction of the devices) and
+    <device> [kW], <device> [kWh] and <device> Coverage per device.
+    """
+    import pandas as pd
+
+    slot_starts, profiles = energy_profiles(mcap_reader, topics, slot_ns, max_gap_ns, start_ns, end_ns)
+
+    columns = {"DateTime": pd.to_datetime([datetime.datetime.fromtimestamp(x / 1e9) for x in slot_starts.tolist()])}
+    if profiles:
+        # NaN where no device covers the slot, partially covered slots are shown by Coverage
+        mean_kw = np.array([x[0] for x in profiles.values()])
+        energy_kwh = np.array([x[1] for x in profiles.values()])
+        uncovered = np.all(np.isnan(mean_kw), axis=0)
+        columns[LOAD_PROFILE_COLUMN] = np.where(uncovered, np.nan, np.nansum(mean_kw, axis=0))
+        columns["Load Profile [kWh]"] = np.where(uncovered, np.nan, np.nansum(energy_kwh, axis=0))
+        columns["Coverage"] = np.mean([x[2] for x in profiles.values()], axis=0)
+    for device, (mean_kw, energy_kwh, coverage) in profiles.items():
+        columns[device + " [kW]"] = mean_kw
+        columns[device + " [kWh]"] = energy_kwh
+        columns[device + " Coverage"] = coverage
+
+    return pd.DataFrame(columns)
+
+
+if __name__ == '__main__':
+    # usage: mcap_energy.py <file.mcap> <output.xlsx|output.csv>
+    from mcap_reader import McapReader
+
+    mcap_reader = McapReader()
+    mcap_reader.open(sys.argv[1])
+    df = get_load_profile(mcap_reader)
+    if sys.argv[2].endswith(".xlsx"):
+        df.to_excel(sys.argv[2], sheet_name="Summary", index=False)
+    else:
+        df.to_csv(sys.argv[2], index=False)
+    print(f"Wrote {len(df)} slots of {(len(df.columns) - 4) // 3} devices to {sys.argv[2]}")
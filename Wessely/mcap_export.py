@@ -0,0 +1,256 @@
+import csv
+import datetime
+import os
+from typing import Optional
+
+import numpy as np
+
+# length of one export slot, 15 minutes in nanoseconds
+SLOT_NS = 15 * 60 * 10 ** 9
+
+NS_PER_HOUR = 3600 * 10 ** 9
+
+AGGREGATIONS = ("first", "mean", "max", "energy")
+
+# samples further apart are a gap in the recording and not integrated by the energy aggregation, 5 minutes
+DEFAULT_MAX_GAP_NS = 5 * 60 * 10 ** 9
+
+
+def _is_numeric(dtype):
+    return dtype.kind in "iufb"
+
+
+def _slot_energy(ts, values, boundaries, max_gap_ns=None):
+    """
+    Integrates values over time with the trapezoidal rule and returns the integral in value * hours
+    between consecutive boundaries. Segments crossing a boundary are split at the linearly interpolated value.
+    Segments between samples more than max_gap_ns apart are gaps and not integrated.
+    """
+    ts = ts.astype(np.float64)
+    values = values.astype(np.float64)
+
+    # cumulative integral at every sample
+    cumulative = np.zeros(ts.shape, dtype=np.float64)
+    covered = np.ones((max(len(ts) - 1, 0),), dtype=np.float64)
+    if max_gap_ns is not None:
+        covered[np.diff(ts) > max_gap_ns] = 0
+    if len(ts) > 1:
+        cumulative[1:] = np.cumsum(covered * np.diff(ts) * (values[1:] + values[:-1]) / 2)
+
+    # cumulative integral at the boundaries, clipped to the sampled time range
+    b = np.clip(boundaries.astype(np.float64), ts[0], ts[-1])
+    idx = np.clip(np.searchsorted(ts, b, side='right') - 1, 0, len(ts) - 1)
+    next_idx = np.minimum(idx + 1, len(ts) - 1)
+    dt = ts[next_idx] - ts[idx]
+    frac = np.divide(b - ts[idx], dt, out=np.zeros_like(b), where=dt > 0)
+    value_b = values[idx] + frac * (values[next_idx] - values[idx])
+    partial = (b - ts[idx]) * (values[idx] + value_b) / 2
+    if len(covered):
+        partial *= covered[np.minimum(idx, len(covered) - 1)]
+    cumulative_b = cumulative[idx] + partial
+
+    return np.diff(cumulative_b) / NS_PER_HOUR
+
+
+def _aggregate_valid(ts, column, valid, how: str, inverse, num_slots: int, boundaries, slot_idx,
+                     max_gap_ns: Optional[int]):
+    """
+    Returns the mean, max or energy of the valid values of one field per slot, see _resample.
+    Slots without valid value are NaN for mean and max and 0 for energy.
+    """
+    column = column.astype(np.float64)
+    if how == "mean":
+        sums = np.bincount(inverse[valid], weights=column[valid], minlength=num_slots)
+        counts = np.bincount(inverse[valid], minlength=num_slots)
+        return np.divide(sums, counts, out=np.full((num_slots,), np.nan), where=counts > 0)
+
+    if how == "max":
+        maximum = np.full((num_slots,), -np.inf)
+        np.maximum.at(maximum, inverse[valid], column[valid])
+        maximum[maximum == -np.inf] = np.nan
+        return maximum
+
+    if not np.any(valid):
+        return np.zeros((num_slots,))
+    return _slot_energy(ts[valid], column[valid], boundaries, max_gap_ns)[slot_idx]
+
+
+def _resample(data, how: str, slot_ns: int, max_gap_ns: Optional[int] = DEFAULT_MAX_GAP_NS, validity=None):
+    """
+    Returns the slot numbers and the resampled structured array, see resample.
+    """
+    validity = {} if validity is None else validity
+    if how not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation {how}, use one of {AGGREGATIONS}")
+
+    slots = data['ts'] // np.uint64(slot_ns)
+    slot_ids, first_idx, inverse = np.unique(slots, return_index=True, return_inverse=True)
+
+    # slots in the order they first appear, like the rows of data
+    order = np.argsort(first_idx, kind='stable')
+    slot_ids = slot_ids[order]
+    first_idx = first_idx[order]
+    position = np.empty_like(order)
+    position[order] = np.arange(len(order))
+    inverse = position[inverse.ravel()]
+
+    if how == "first":
+        return slot_ids, data[first_idx]
+
+    np_struct_format = []
+    for field in data.dtype.names:
+        dtype = data.dtype[field]
+        if field != "ts" and _is_numeric(dtype) and (how in ("mean", "energy") or field in validity):
+            dtype = np.dtype(np.float64)
+        np_struct_format.append((field, dtype))
+
+    out = np.zeros((len(slot_ids),), dtype=np_struct_format)
+    out['ts'] = slot_ids * np.uint64(slot_ns)
+    counts = np.bincount(inverse, minlength=len(slot_ids))
+
+    # edges of every slot from the first to the last one, empty slots in between get their own energy
+    first_slot = int(slot_ids.min()) if len(slot_ids) else 0
+    slot_idx = slot_ids.astype(np.int64) - first_slot
+    boundaries = np.arange(first_slot, first_slot + int(slot_idx.max(initial=0)) + 2, dtype=np.int64) * slot_ns
+
+    for field in data.dtype.names:
+        if field == "ts":
+            continue
+        column = data[field]
+        valid = validity.get(field)
+        if not _is_numeric(column.dtype):
+            out[field] = column[first_idx]
+        elif valid is not None:
+            out[field] = _aggregate_valid(data['ts'], column, valid, how, inverse, len(slot_ids), boundaries,
+                                          slot_idx, max_gap_ns)
+        elif how == "mean":
+            out[field] = np.bincount(inverse, weights=column, minlength=len(slot_ids)) / counts
+        elif how == "max":
+            maximum = column[first_idx].copy()
+            np.maximum.at(maximum, inverse, column)
+            out[field] = maximum
+        elif len(data):
+            out[field] = _slot_energy(data['ts'], column, boundaries, max_gap_ns)[slot_idx]
+
+    return slot_ids, out
+
+
+def resample(data, how: str = "first", slot_ns: int = SLOT_NS, max_gap_ns: Optional[int] = DEFAULT_MAX_GAP_NS,
+             validity=None):
+    """
+    Bins the rows of a structured array into slots of slot_ns (default 15 minutes) by integer division of ts
+    and returns one row per non-empty slot:
+        first: the first row of the slot, including its ts
+        mean: the mean of every numeric field, ts is the slot start
+        max: the maximum of every numeric field, ts is the slot start
+        energy: the integral of every numeric field over time within the slot in field unit * hours
+                (W -> Wh), ts is the slot start; data must be sorted by ts,
+                segments between samples more than max_gap_ns apart are not integrated
+    Non-numeric fields take the value of the first row of the slot.
+    validity optionally gives the valid rows of numeric fields as dictionary of field name to bool array
+    (see McapTopic.get_validity), mean, max and energy then only use valid values and mean and max are
+    float64 with NaN for slots without valid value.
+    """
+    return _resample(data, how, slot_ns, max_gap_ns, validity)[1]
+
+
+def iter_resample(batches, how: str = "first", slot_ns: int = SLOT_NS,
+                  max_gap_ns: Optional[int] = DEFAULT_MAX_GAP_NS, validity=None):
+    """
+    Resamples an iterable of structured arrays sorted by ts, e.g. McapTopic.iter_batches,
+    and yields resampled arrays. Only the rows of the unfinished last slot are kept between batches.
+    validity is indexed by the row number over all batches, see resample.
+    """
+    carry = None
+    first_slot = None
+    # row number of the first row of data over all batches
+    data_start = 0
+    for batch in batches:
+        data = batch if carry is None else np.concatenate([carry, batch])
+        if not len(data):
+            continue
+
+        data_validity = None
+        if validity is not None:
+            data_validity = {k: v[data_start:data_start + len(data)] for k, v in validity.items()}
+
+        slots = data['ts'] // np.uint64(slot_ns)
+        last_slot = slots[-1]
+        slot_ids, out = _resample(data, how, slot_ns, max_gap_ns, data_validity)
+        keep = slot_ids < last_slot
+        if first_slot is not None:
+            keep &= slot_ids >= first_slot
+        yield out[keep]
+
+        # carry the rows of the last slot, the energy integral also needs the (valid) sample before it
+        start = int(np.searchsorted(slots, last_slot))
+        if how == "energy":
+            start = max(start - 1, 0)
+            # older samples are more than max_gap_ns before the slot, a gap which is not integrated
+            lower = 0
+            if max_gap_ns is not None:
+                lower = int(np.searchsorted(data['ts'], max(int(last_slot) * slot_ns - max_gap_ns, 0)))
+            for valid in (data_validity or {}).values():
+                previous = np.flatnonzero(valid[lower:start + 1])
+                if len(previous):
+                    start = min(start, lower + int(previous[-1]))
+        carry = data[start:]
+        data_start += start
+        first_slot = last_slot
+
+    if carry is not None:
+        if validity is not None:
+            validity = {k: v[data_start:data_start + len(carry)] for k, v in validity.items()}
+        slot_ids, out = _resample(carry, how, slot_ns, max_gap_ns, validity)
+        yield out[slot_ids >= first_slot]
+
+
+def _slot_labels(ts, slot_ns: int):
+    """
+    Returns the local time labels of the slots of the given ts values.
+    """
+    slot_starts = (ts // np.uint64(slot_ns)) * np.uint64(slot_ns)
+    return [datetime.datetime.fromtimestamp(x / 1e9).strftime("%Y-%m-%d %H:%M") for x in slot_starts.tolist()]
+
+
+def export_csv(data, output_file: str, how: str = "first", slot_ns: int = SLOT_NS,
+               max_gap_ns: Optional[int] = DEFAULT_MAX_GAP_NS, validity=None):
+    """
+    Writes the resampled topic data to a csv file with a leading local timestamp column per slot.
+    data is either a structured array or an iterable of structured arrays sorted by ts (see iter_resample),
+    validity optionally the valid rows of its numeric fields, see resample.
+    """
+    batches = [data] if isinstance(data, np.ndarray) else data
+
+    # Remove file if it exists
+    if os.path.exists(output_file):
+        os.remove(output_file)
+
+    with open(output_file, "w", newline="") as f:
+        writer = csv.writer(f)
+        header_written = False
+
+        for resampled in iter_resample(batches, how, slot_ns, max_gap_ns, validity):
+            if not header_written:
+                # Header: add readable timestamp at the beginning
+                writer.writerow(["timestamp"] + list(resampled.dtype.names))
+                header_written = True
+
+            columns = [_slot_labels(resampled['ts'], slot_ns)] + [resampled[x].tolist() for x in resampled.dtype.names]
+            writer.writerows(zip(*columns))
+
+
+def export_topics_csv(mcap_reader, output_dir: str, how: str = "first", slot_ns: int = SLOT_NS, workers=None,
+                      max_gap_ns: Optional[int] = DEFAULT_MAX_GAP_NS):
+    """
+    Decodes all topics of an opened McapReader (see McapReader.get_all_data) and writes one csv file per topic.
+    Aggregations skip invalid values, e.g. of offline devices, see McapTopic.get_validity.
+    The written files are reported through the progress callback of the reader, see McapReader.set_progress.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    for topic_name, module_data in mcap_reader.get_all_data(workers).items():
+        mcap_topic = mcap_reader.get_topic(topic_name)
+        output_file = os.path.join(output_dir, topic_name.replace("/", "_") + ".csv")
+        export_csv(module_data, output_file, how, slot_ns, max_gap_ns, mcap_topic.get_validity())
+        mcap_topic._report_progress(mcap_topic.get_message_count(), "CSV saved: " + os.path.abspath(output_file))
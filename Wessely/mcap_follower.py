@@ -0,0 +1,229 @@
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from mcap.opcode import Opcode
+from mcap.stream_reader import MAGIC_SIZE
+
+from mcap_reader import (McapTopic, DecodeMetrics, ORDER_KEY_FORMAT, _IndexedReader, _read_chunk_messages,
+                         _scan_summary)
+
+# batches a subscriber buffer holds before the follower waits for the consumer
+DEFAULT_BUFFER_SIZE = 16
+
+
+class BatchRingBuffer:
+    """
+    Bounded FIFO of decoded batches on a fixed ring of slots.
+    put waits while the ring is full, which holds back the follower until the consumer catches up,
+    get waits while it is empty and returns None once the buffer is closed and drained.
+    Supports async iteration: async for batch in buffer.
+    """
+    def __init__(self, capacity: int = DEFAULT_BUFFER_SIZE):
+        self._slots = [None] * capacity
+        self._head = 0
+        self._count = 0
+        self._closed = False
+        self._condition = asyncio.Condition()
+
+    def __len__(self):
+        return self._count
+
+    def capacity(self):
+        return len(self._slots)
+
+    async def put(self, batch):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._count < len(self._slots) or self._closed)
+            if self._closed:
+                return
+            self._slots[(self._head + self._count) % len(self._slots)] = batch
+            self._count += 1
+            self._condition.notify_all()
+
+    async def get(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._count > 0 or self._closed)
+            if self._count == 0:
+                return None
+            batch = self._slots[self._head]
+            self._slots[self._head] = None
+            self._head = (self._head + 1) % len(self._slots)
+            self._count -= 1
+            self._condition.notify_all()
+            return batch
+
+    async def close(self):
+        async with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        batch = await self.get()
+        if batch is None:
+            raise StopAsyncIteration
+        return batch
+
+
+class McapFollower:
+    """
+    Tails an mcap file while it is being written, e.g. by a Shelly logger, and publishes the messages of
+    every newly written chunk as one structured array per topic to the buffers of its subscribers.
+    The file is indexed incrementally like a file without summary (see mcap_reader._scan_summary)
+    and decoded by the same block decoders as McapReader.get_data.
+    """
+    def __init__(self, mcap_path: str, poll_interval: float = 1.0, from_start: bool = True):
+        self._mcap_path = Path(mcap_path)
+        self._poll_interval = poll_interval
+        self._from_start = from_start
+        self._summary = None
+        self._offset = MAGIC_SIZE
+        self._finished = False
+        self._stopped = False
+        self._subscribers = {}
+        self._mcap_topics = {}
+        self._metrics = DecodeMetrics()
+        self._mcap_file = None
+        self._reader = None
+
+    def subscribe(self, topic: str, capacity: int = DEFAULT_BUFFER_SIZE):
+        """
+        Returns a new BatchRingBuffer receiving the decoded batches of a topic.
+        Every subscriber gets every batch, the slowest one sets the pace of the follower.
+        """
+        buffer = BatchRingBuffer(capacity)
+        self._subscribers.setdefault(topic, []).append(buffer)
+        return buffer
+
+    def get_metrics(self):
+        return self._metrics
+
+    def stop(self):
+        """
+        Stops following after the current poll, run then closes all subscriber buffers.
+        """
+        self._stopped = True
+
+    def _get_topic(self, topic: str):
+        """
+        Returns the McapTopic of a subscribed topic once its channel, schema and first message were written.
+        """
+        if topic in self._mcap_topics:
+            return self._mcap_topics[topic]
+
+        message_counts = self._summary.statistics.channel_message_counts
+        for k, v in self._summary.channels.items():
+            if v.topic == topic and k in message_counts and v.schema_id in self._summary.schemas:
+                self._mcap_topics[topic] = McapTopic(self._reader, self._mcap_path, k, progress=None,
+                                                     metrics=self._metrics)
+                return self._mcap_topics[topic]
+
+        return None
+
+    def _poll(self):
+        """
+        Indexes the records written since the last poll and decodes the messages of the new chunks.
+        Returns a dictionary of topic name to structured array sorted like McapReader.get_data.
+        """
+        if self._mcap_file is None:
+            self._mcap_file = open(self._mcap_path, "rb")
+            self._reader = _IndexedReader(self._mcap_file)
+
+        chunk_count = len(self._summary.chunk_indexes) if self._summary is not None else 0
+        file_size = os.path.getsize(self._mcap_path)
+        self._summary, self._offset = _scan_summary(self._mcap_file, file_size, self._summary, self._offset)
+        # the reader of the topics reads through the summary built so far
+        self._reader.summary = self._summary
+
+        # the writer has finished the data section
+        self._mcap_file.seek(self._offset)
+        self._finished = self._mcap_file.read(1) == bytes([Opcode.DATA_END])
+
+        new_chunks = self._summary.chunk_indexes[chunk_count:]
+        if not self._from_start:
+            # skip what was written before following started
+            self._from_start = True
+            return {}
+
+        mcap_topics = {x: self._get_topic(x) for x in self._subscribers}
+        mcap_topics = {k: v for k, v in mcap_topics.items() if v is not None}
+        channel_topics = {}
+        for topic, mcap_topic in mcap_topics.items():
+            channel_topics.update({x: topic for x in mcap_topic._get_channel_ids()})
+
+        # read every chunk once and split its messages by topic
+        start = time.perf_counter()
+        messages = {x: [] for x in mcap_topics}
+        for chunk_index in new_chunks:
+            for idx, message in _read_chunk_messages(self._mcap_file, chunk_index, set(channel_topics),
+                                                     self._metrics):
+                messages[channel_topics[message.channel_id]].append((chunk_index.chunk_start_offset, idx, message))
+
+        batches = {}
+        for topic, topic_messages in messages.items():
+            if not topic_messages:
+                continue
+
+            keys = np.zeros((len(topic_messages),), dtype=ORDER_KEY_FORMAT)
+            keys['log_time'] = [x[2].log_time for x in topic_messages]
+            keys['chunk_offset'] = [x[0] for x in topic_messages]
+            keys['record_index'] = [x[1] for x in topic_messages]
+            order = np.lexsort((keys['record_index'], keys['chunk_offset'], keys['log_time'])).tolist()
+
+            mcap_topic = mcap_topics[topic]
+            publish_times = [topic_messages[x][2].publish_time for x in order]
+            payloads = [topic_messages[x][2].data for x in order]
+            if "oscilloscope" in topic:
+                decoder = mcap_topic._decode_oscilloscope_block
+            else:
+                decoder = mcap_topic._decode_block
+            batches[topic] = decoder(publish_times, payloads, mcap_topic.get_np_struct_format())
+
+        self._metrics.add_wall_time(time.perf_counter() - start)
+        return batches
+
+    async def run(self):
+        """
+        Follows the file until stop is called or the writer finishes the file, then closes all subscriber
+        buffers. Reading and decoding run in a worker thread, so consumers keep running meanwhile.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while not self._stopped:
+                batches = await loop.run_in_executor(None, self._poll)
+                for topic, batch in batches.items():
+                    for buffer in self._subscribers[topic]:
+                        await buffer.put(batch)
+
+                if self._finished:
+                    break
+                await asyncio.sleep(self._poll_interval)
+        finally:
+            for buffers in self._subscribers.values():
+                for buffer in buffers:
+                    await buffer.close()
+            if self._mcap_file is not None:
+                self._mcap_file.close()
+                self._mcap_file = None
+
+
+async def _print_batches(buffer: BatchRingBuffer, topic: str):
+    async for batch in buffer:
+        print(f"{topic}: {len(batch)} new rows up to ts {batch['ts'][-1]}")
+
+
+async def _follow(mcap_path: str, topics):
+    follower = McapFollower(mcap_path, from_start=False)
+    consumers = [_print_batches(follower.subscribe(x), x) for x in topics]
+    await asyncio.gather(follower.run(), *consumers)
+
+
+if __name__ == '__main__':
+    # usage: mcap_follower.py <file.mcap> <topic> [topic ...]
+    asyncio.run(_follow(sys.argv[1], sys.argv[2:]))
@@ -0,0 +1,153 @@
+import json
+import sys
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from mcap.writer import CompressionType, Writer
+
+# device names of the ShellyPro3EM recording, each device has SHELLY_FIELDS and a device string field
+SHELLY_DEVICES = ["Kompressor26kW", "Kompressor11kW", "Waermepumpe", "Ofen24kW", "Ofen34kW5", "Lackierkammer",
+                  "Rundtaktautomat"]
+
+SHELLY_FIELDS = ["total_current", "total_act_power", "total_aprt_power"]
+
+# start time of the ShellyPro3EM recording
+DEFAULT_START_NS = 1747008006073402944
+
+# messages generated and written at once
+GENERATE_BLOCK_SIZE = 4096
+
+
+def _shelly_schema(devices):
+    """
+    Returns the json schema of a Shelly-like topic, fields are <device>_device and <device>_<field>.
+    """
+    properties = {}
+    for device in devices:
+        properties[device + "_device"] = {"type": "string"}
+        for field in SHELLY_FIELDS:
+            properties[device + "_" + field] = {"type": "number"}
+    return {"type": "object", "properties": properties}
+
+
+def _shelly_payloads(rng, devices, state, count: int, offline_ratio: float, string_ratio: float):
+    """
+    Returns count json payloads of a Shelly-like topic. The power of every device is a random walk,
+    offline devices report -1 for all their fields and a fraction of the values are sent as strings.
+    Like the recordings, the device string fields of the schema are not sent.
+    """
+    keys = [device + "_" + field for device in devices for field in SHELLY_FIELDS]
+    template = "{" + ",".join('"' + x + '":%s' for x in keys) + "}"
+
+    # random walk of the active power per device, current and apparent power follow it
+    steps = rng.normal(0.0, 5.0, (count, len(devices)))
+    power = np.abs(state + np.cumsum(steps, axis=0))
+    state[:] = power[-1]
+    values = np.empty((count, len(devices), len(SHELLY_FIELDS)), dtype=np.float64)
+    values[:, :, 0] = power / 230.0
+    values[:, :, 1] = power
+    values[:, :, 2] = power * rng.uniform(1.0, 1.5, (count, len(devices)))
+
+    offline = rng.random((count, len(devices))) < offline_ratio
+    values[offline] = -1
+    values = values.reshape(count, len(keys))
+
+    # wide enough for the quotes of string values
+    text = np.char.mod("%.3f", values).astype("U32")
+    text[values == -1] = "-1"
+    strings = rng.random(values.shape) < string_ratio
+    text[strings] = np.char.add(np.char.add('"', text[strings]), '"')
+
+    return [(template % tuple(row)).encode() for row in text.tolist()]
+
+
+def _oscilloscope_payloads(rng, count: int, window_size: int, channels: int):
+    """
+    Returns count json payloads of oscilloscope windows with rel_time in ns and one array per channel.
+    """
+    rel_time = json.dumps(list(range(0, window_size * 1000, 1000)))
+    payloads = []
+    for samples in rng.normal(0.0, 1.0, (count, channels, window_size)).round(4):
+        data = ",".join('"data%d":%s' % (idx + 1, json.dumps(x)) for idx, x in enumerate(samples.tolist()))
+        payloads.append(('{"rel_time":' + rel_time + "," + data + ',"gain":1.0}').encode())
+    return payloads
+
+
+def generate_mcap(mcap_path: str, topics: int = 1, messages: int = 10000, target_size: Optional[int] = None,
+                  devices: int = len(SHELLY_DEVICES), oscilloscope_topics: int = 0, window_size: int = 1000,
+                  offline_ratio: float = 0.1, string_ratio: float = 0.001, period_ns: int = 5 * 10 ** 9,
+                  start_ns: int = DEFAULT_START_NS, chunk_size: int = 1024 * 1024, seed: int = 0):
+    """
+    Writes a synthetic mcap file with json encoded topics like the ShellyData recordings:
+        topics Shelly-like topics ShellyPro3EM_<n> with the fields of devices devices (see _shelly_payloads)
+        oscilloscope_topics topics oscilloscope_<n> with windows of window_size samples
+    Every topic gets one message per period_ns. Writes messages messages per topic,
+    or with target_size as many as needed for a file of about target_size bytes.
+    Returns the number of messages written.
+    """
+    rng = np.random.default_rng(seed)
+    device_names = [SHELLY_DEVICES[x % len(SHELLY_DEVICES)] + ("" if x < len(SHELLY_DEVICES) else str(x))
+                    for x in range(devices)]
+
+    with open(mcap_path, "wb") as f:
+        writer = Writer(f, chunk_size=chunk_size, compression=CompressionType.ZSTD)
+        writer.start()
+
+        channels = []
+        for idx in range(topics):
+            schema_id = writer.register_schema(name="shelly_pro_3em_" + str(idx), encoding="jsonschema",
+                                               data=json.dumps(_shelly_schema(device_names)).encode())
+            channel_id = writer.register_channel(topic="ShellyPro3EM_" + str(idx), message_encoding="json",
+                                                 schema_id=schema_id)
+            channels.append((channel_id, np.full((devices,), 500.0)))
+
+        oscilloscope_schema = {"type": "object", "properties": {"rel_time": {"type": "array"},
+                                                                "data1": {"type": "array"},
+                                                                "data2": {"type": "array"},
+                                                                "gain": {"type": "number"}}}
+        for idx in range(oscilloscope_topics):
+            schema_id = writer.register_schema(name="oscilloscope_" + str(idx), encoding="jsonschema",
+                                               data=json.dumps(oscilloscope_schema).encode())
+            channel_id = writer.register_channel(topic="oscilloscope_" + str(idx), message_encoding="json",
+                                                 schema_id=schema_id)
+            channels.append((channel_id, None))
+
+        written = 0
+        while (written < messages) if target_size is None else (f.tell() < target_size):
+            count = GENERATE_BLOCK_SIZE if target_size is not None else min(GENERATE_BLOCK_SIZE, messages - written)
+            publish_times = start_ns + (written + np.arange(count, dtype=np.int64)) * period_ns
+
+            block_times = []
+            block_messages = []
+            for channel_idx, (channel_id, state) in enumerate(channels):
+                if state is None:
+                    payloads = _oscilloscope_payloads(rng, count, window_size, 2)
+                else:
+                    payloads = _shelly_payloads(rng, device_names, state, count, offline_ratio, string_ratio)
+
+                # topics publish with a small offset to each other
+                block_times.append(publish_times + channel_idx * 1000)
+                block_messages.extend((channel_id, x) for x in payloads)
+
+            # messages of all topics in publish_time order like the recordings
+            block_times = np.concatenate(block_times)
+            for idx in np.argsort(block_times, kind='stable').tolist():
+                publish_time = int(block_times[idx])
+                writer.add_message(channel_id=block_messages[idx][0], log_time=publish_time,
+                                   publish_time=publish_time, data=block_messages[idx][1])
+
+            written += count
+
+        writer.finish()
+
+    return written
+
+
+if __name__ == '__main__':
+    # usage: mcap_generator.py <output.mcap> [size in MB] [oscilloscope topics]
+    output = sys.argv[1] if len(sys.argv) > 1 else str(Path(__file__).parent / "ShellyData" / "synthetic.mcap")
+    size_mb = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    num_oscilloscope = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    count = generate_mcap(output, target_size=int(size_mb * 1024 * 1024), oscilloscope_topics=num_oscilloscope)
+    print(f"Generated {output}: {count} messages per topic")
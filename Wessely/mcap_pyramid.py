@@ -0,0 +1,177 @@
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from mcap_reader import McapReader, McapTopic, _prepare_cache_dir, _write_manifest
+
+# bucket width of the finest pyramid level, 2^30 ns (about 1.07 s), level k has buckets of BASE_BUCKET_NS << k
+BASE_BUCKET_NS = 1 << 30
+
+# levels above the finest one, the buckets of the last level span 2^63 ns and cover any uint64 timestamp
+MAX_LEVELS = 33
+
+# format of one pyramid level, ts is the bucket start
+LEVEL_FORMAT = [('ts', np.uint64), ('min', np.float64), ('max', np.float64), ('mean', np.float64),
+                ('count', np.uint64)]
+
+
+def _reduce_buckets(buckets, values_min, values_max, sums, counts):
+    """
+    Combines consecutive rows of equal bucket number. Returns the bucket numbers and min, max, sum and count
+    per bucket. buckets must be sorted.
+    """
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    return (buckets[starts], np.minimum.reduceat(values_min, starts), np.maximum.reduceat(values_max, starts),
+            np.add.reduceat(sums, starts), np.add.reduceat(counts, starts))
+
+
+def _build_levels(ts, values, base_bucket_ns: int):
+    """
+    Returns the pyramid levels of one field as list of LEVEL_FORMAT arrays, finest level first.
+    Each level halves the number of time buckets of the level below until one bucket is left.
+    """
+    values = values.astype(np.float64)
+    if not len(ts):
+        return [np.zeros((0,), dtype=LEVEL_FORMAT)]
+
+    buckets, values_min, values_max, sums, counts = _reduce_buckets(
+        ts // np.uint64(base_bucket_ns), values, values, values, np.ones(values.shape, dtype=np.uint64))
+
+    levels = []
+    for level in range(MAX_LEVELS + 1):
+        data = np.zeros((len(buckets),), dtype=LEVEL_FORMAT)
+        data['ts'] = buckets * np.uint64(base_bucket_ns << level)
+        data['min'] = values_min
+        data['max'] = values_max
+        data['mean'] = sums / counts
+        data['count'] = counts
+        levels.append(data)
+
+        if len(buckets) <= 1:
+            break
+        buckets, values_min, values_max, sums, counts = _reduce_buckets(
+            buckets >> np.uint64(1), values_min, values_max, sums, counts)
+
+    return levels
+
+
+class PyramidIndex:
+    """
+    Multi-resolution min/max/mean index of the numeric fields of one topic for plotting long recordings:
+        <cache_dir>/<field>/<level>.npy
+        <cache_dir>/manifest.json
+    Level k holds one row (see LEVEL_FORMAT) per non-empty time bucket of base_bucket_ns << k.
+    Levels are memory mapped, a query only reads the rows of its time range.
+    """
+    def __init__(self, cache_dir: Path):
+        self._cache_dir = Path(cache_dir)
+        with open(self._cache_dir / "manifest.json", 'r') as f:
+            self._manifest = json.load(f)
+
+    def get_manifest(self):
+        return self._manifest
+
+    def get_fields(self):
+        return list(self._manifest["levels"].keys())
+
+    def get_levels(self, field: str):
+        return self._manifest["levels"][field]
+
+    def get_bucket_ns(self, level: int):
+        return self._manifest["base_bucket_ns"] << level
+
+    def load_level(self, field: str, level: int, start_ns: Optional[int] = None, end_ns: Optional[int] = None):
+        """
+        Returns the buckets of a level overlapping start_ns <= ts < end_ns.
+        """
+        data = np.load(self._cache_dir / field / (str(level) + ".npy"), mmap_mode='r')
+        first = 0
+        if start_ns is not None:
+            first = int(np.searchsorted(data['ts'], max(start_ns - self.get_bucket_ns(level) + 1, 0)))
+        last = len(data) if end_ns is None else int(np.searchsorted(data['ts'], end_ns))
+        return np.array(data[first:last])
+
+    def choose_level(self, field: str, start_ns: int, end_ns: int, width_px: int):
+        """
+        Returns the finest level with at most about one bucket per pixel for the time range.
+        """
+        bucket_ns = max((end_ns - start_ns) / max(width_px, 1), 1)
+        level = int(np.ceil(np.log2(max(bucket_ns / self._manifest["base_bucket_ns"], 1))))
+        return min(level, self.get_levels(field) - 1)
+
+    def query(self, field: str, start_ns: int, end_ns: int, width_px: int):
+        """
+        Returns the min, max and mean buckets (see LEVEL_FORMAT) of a field for plotting the time range
+        start_ns <= ts < end_ns at width_px pixels, from the level chosen by choose_level.
+        """
+        return self.load_level(field, self.choose_level(field, start_ns, end_ns, width_px), start_ns, end_ns)
+
+
+def build_pyramid(data, cache_dir: Path, fields=None, base_bucket_ns: int = BASE_BUCKET_NS, source=None,
+                  validity=None):
+    """
+    Builds the pyramid index of the given fields (default: all numeric fields) of a structured array
+    in cache_dir, replacing an existing one (see _prepare_cache_dir).
+    source describes the data and is stored in the manifest.
+    validity optionally gives the valid rows per field (see McapTopic.get_validity), invalid values are left out.
+    """
+    cache_dir = Path(cache_dir)
+    _prepare_cache_dir(cache_dir)
+
+    if fields is None:
+        fields = [x for x in data.dtype.names if x != "ts" and data.dtype[x].kind in "iuf"]
+
+    ts = data['ts']
+    order = None
+    if len(ts) > 1 and np.any(ts[1:] < ts[:-1]):
+        order = np.argsort(ts, kind='stable')
+        ts = ts[order]
+
+    levels = {}
+    for field in fields:
+        values = data[field] if order is None else data[field][order]
+        field_ts = ts
+        if validity is not None and field in validity:
+            valid = validity[field] if order is None else validity[field][order]
+            field_ts = ts[valid]
+            values = values[valid]
+        field_levels = _build_levels(field_ts, values, base_bucket_ns)
+        os.makedirs(cache_dir / field)
+        for level, level_data in enumerate(field_levels):
+            np.save(cache_dir / field / (str(level) + ".npy"), level_data)
+        levels[field] = len(field_levels)
+
+    manifest = {"source": source, "base_bucket_ns": base_bucket_ns, "validity": validity is not None,
+                "levels": levels}
+    _write_manifest(cache_dir, manifest)
+
+    return PyramidIndex(cache_dir)
+
+
+def get_pyramid(mcap_reader: McapReader, topic: str, cache_dir: Optional[str] = None,
+                base_bucket_ns: int = BASE_BUCKET_NS):
+    """
+    Returns the pyramid index of a topic, building it from the valid values of the topic data
+    (see McapReader.get_data and McapTopic.get_validity) if missing or stale. Default cache_dir is pyramid/<topic> in the numpy cache folder of the topic.
+    """
+    mcap_topic: McapTopic = mcap_reader.get_topic(topic)
+    if cache_dir is None:
+        cache_dir = mcap_topic._numpy_dir / "pyramid" / topic
+    cache_dir = Path(cache_dir)
+
+    source = mcap_topic._cache_manifest()
+    if os.path.exists(cache_dir / "manifest.json"):
+        pyramid = PyramidIndex(cache_dir)
+        manifest = pyramid.get_manifest()
+        if (manifest["source"] == source and manifest["base_bucket_ns"] == base_bucket_ns and
+                manifest.get("validity", False)):
+            return pyramid
+
+    # only numbers, compact string codes are no values to plot
+    fields = [x for x in mcap_topic.get_fields()
+              if x != "ts" and mcap_topic._field_dtypes[x] in ("number", "integer")]
+    return build_pyramid(mcap_topic.get_data(), cache_dir, fields, base_bucket_ns, source,
+                         mcap_topic.get_validity(fields))
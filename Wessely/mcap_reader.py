@@ -2,30 +2,758 @@ import io
 import os
 import json
 import time
-import csv
+import struct
+import shutil
+import hashlib
+import operator
+import tempfile
+import itertools
+import threading
+import collections
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Optional
 
 import mcap.reader
 import mcap.summary
 import numpy as np
 from pathlib import Path
+from mcap.data_stream import ReadDataStream, RecordBuilder
+from mcap.exceptions import McapError
+from mcap.opcode import Opcode
 from mcap.reader import make_reader
+from mcap.records import Channel, Chunk, ChunkIndex, Message, Metadata, Schema, Statistics
+from mcap.stream_reader import MAGIC_SIZE, breakup_chunk
+
+# number of messages decoded at once by McapTopic.get_default_data
+DECODE_BLOCK_SIZE = 4096
+
+# chunk groups per worker in McapTopic.get_default_data_parallel, balances uneven chunks
+CHUNK_GROUPS_PER_WORKER = 4
+
+# chunks read and decompressed ahead of the decoder, bounds the memory of the read pipeline
+PREFETCH_CHUNKS = 8
+
+# threads reading and decompressing chunks, zstd and lz4 release the GIL
+PREFETCH_THREADS = 2
+
+# version of the numpy cache manifest, bump when the cache layout changes
+CACHE_VERSION = 1
+
+# file marking a folder as cache while it is built, see _prepare_cache_dir
+CACHE_MARKER = ".building"
+
+# bytes read from the start and the summary section of an mcap file for its fingerprint
+FINGERPRINT_SIZE = 1 << 20
+
+# version of the sidecar index of mcap files without summary, bump when its layout changes
+INDEX_VERSION = 1
+
+# supported channel message encodings and the schema encoding describing their fields, see McapTopic
+MESSAGE_ENCODINGS = {"json": "jsonschema", "cbor": "jsonschema", "protobuf": "protobuf"}
+
+# json types of protobuf field types, repeated numbers are arrays like the oscilloscope windows
+PROTOBUF_TYPES = {"TYPE_DOUBLE": "number", "TYPE_FLOAT": "number", "TYPE_INT64": "integer", "TYPE_UINT64": "integer",
+                  "TYPE_INT32": "integer", "TYPE_UINT32": "integer", "TYPE_SINT32": "integer",
+                  "TYPE_SINT64": "integer", "TYPE_FIXED32": "integer", "TYPE_FIXED64": "integer",
+                  "TYPE_SFIXED32": "integer", "TYPE_SFIXED64": "integer", "TYPE_ENUM": "integer",
+                  "TYPE_BOOL": "boolean", "TYPE_STRING": "string"}
+
+# stages the decode time is split into, see DecodeMetrics
+DECODE_STAGES = ("io", "decompression", "json", "fill")
+
+# sort keys giving the message order of mcap.reader.McapReader.iter_messages
+ORDER_KEY_FORMAT = [('log_time', np.uint64), ('chunk_offset', np.uint64), ('record_index', np.uint64)]
+
+# value a Shelly reports in every field while the device is offline, marked invalid like missing values
+OFFLINE_VALUE = -1.0
+
+# one run of messages in which a device has no valid value, rows start <= row < end,
+# from start_ts to end_ts, the ts of the next available message or the last message of the topic
+GAP_FORMAT = [('device', np.uint16), ('start', np.uint64), ('end', np.uint64), ('start_ts', np.uint64),
+              ('end_ts', np.uint64)]
+
+
+def print_progress(topic: str, count: int, total: int, note: Optional[str] = None):
+    """
+    Default progress callback of McapReader, prints the loading progress of a topic on one line.
+    """
+    if note is not None:
+        print("\rLoading " + topic + ": 100% (" + note + ")")
+    elif count >= total:
+        print("\rLoading " + topic + ": 100%")
+    else:
+        print("\rLoading " + topic + ": " + str(int((count / max(total, 1)) * 100)) + "%", end="")
+
+
+class DecodeMetrics:
+    """
+    Decode counters of a McapReader, see McapReader.get_metrics.
+    The decode time is split into the DECODE_STAGES:
+        io: reading records from the mcap file, for sequential reads including the decompression
+        decompression: decompressing chunks, measured where chunks are read directly
+        json: parsing the payloads, json or one of the binary MESSAGE_ENCODINGS
+        fill: writing the decoded values into numpy arrays
+    Stage times of prefetch threads and parallel workers are summed, so they are a breakdown only.
+    The throughput is computed from the wall time of the decodes, added by the code starting them.
+    """
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+        self.seconds = {x: 0.0 for x in DECODE_STAGES}
+        self.wall_seconds = 0.0
+        self.cache_hits = {}
+        self.cache_misses = {}
+
+    def add_time(self, stage: str, seconds: float):
+        self.seconds[stage] += seconds
+
+    def add_wall_time(self, seconds: float):
+        self.wall_seconds += seconds
+
+    def add_messages(self, messages: int, num_bytes: int):
+        self.messages += messages
+        self.bytes += num_bytes
+
+    def add_cache_access(self, topic: str, hit: bool):
+        counts = self.cache_hits if hit else self.cache_misses
+        counts[topic] = counts.get(topic, 0) + 1
+
+    def merge(self, other):
+        """
+        Adds the counters of another DecodeMetrics, e.g. of a process pool worker.
+        The wall time is not added, the workers run at the same time, see add_wall_time.
+        """
+        self.add_messages(other.messages, other.bytes)
+        for stage, seconds in other.seconds.items():
+            self.add_time(stage, seconds)
+        for topic, count in other.cache_hits.items():
+            self.cache_hits[topic] = self.cache_hits.get(topic, 0) + count
+        for topic, count in other.cache_misses.items():
+            self.cache_misses[topic] = self.cache_misses.get(topic, 0) + count
+
+    def get_summary(self):
+        """
+        Returns the counters and the derived throughput as dictionary.
+        """
+        seconds = self.wall_seconds
+        return {
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "seconds": seconds,
+            "msgs_per_s": self.messages / seconds if seconds else 0.0,
+            "bytes_per_s": self.bytes / seconds if seconds else 0.0,
+            "stage_seconds": dict(self.seconds),
+            "cache_hits": dict(self.cache_hits),
+            "cache_misses": dict(self.cache_misses),
+        }
+
+
+def _protobuf_schema(schema):
+    """
+    Returns the message class of a protobuf schema (a FileDescriptorSet), its fields as json schema,
+    the names of its repeated fields and the names of its fields without presence, e.g. proto3 scalars,
+    which are not serialized when 0. Nested messages and bytes fields are not decoded,
+    repeated numbers become arrays.
+    """
+    from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+    from google.protobuf.descriptor import FieldDescriptor
+
+    pool = descriptor_pool.DescriptorPool()
+    for file_descriptor in descriptor_pb2.FileDescriptorSet.FromString(schema.data).file:
+        pool.Add(file_descriptor)
+    descriptor = pool.FindMessageTypeByName(schema.name)
+
+    properties = {}
+    repeated_fields = set()
+    implicit_fields = set()
+    for field in descriptor.fields:
+        json_type = PROTOBUF_TYPES.get(descriptor_pb2.FieldDescriptorProto.Type.Name(field.type))
+        if json_type is None:
+            continue
+        # label is deprecated in newer protobuf versions
+        if field.is_repeated if hasattr(field, "is_repeated") else field.label == FieldDescriptor.LABEL_REPEATED:
+            if json_type not in ("number", "integer"):
+                continue
+            json_type = "array"
+            repeated_fields.add(field.name)
+        # has_presence is missing in older protobuf versions, proto3 optional fields are in a synthetic oneof
+        elif not (field.has_presence if hasattr(field, "has_presence")
+                  else field.containing_oneof is not None or field.file.syntax == "proto2"):
+            implicit_fields.add(field.name)
+        properties[field.name] = {"type": json_type}
+
+    message_class = message_factory.GetMessageClass(descriptor)
+    return message_class, {"type": "object", "properties": properties}, repeated_fields, implicit_fields
+
+
+def _read_chunk_messages(stream, chunk_index, channel_ids, metrics: Optional[DecodeMetrics] = None):
+    """
+    Reads and decompresses one chunk and returns its messages of the given channels
+    as list of (record index, message) tuples in file order.
+    """
+    start = time.perf_counter()
+    stream.seek(chunk_index.chunk_start_offset + 1 + 8, io.SEEK_SET)
+    chunk = Chunk.read(ReadDataStream(stream))
+    read = time.perf_counter()
+    records = breakup_chunk(chunk)
+    if metrics is not None:
+        metrics.add_time("io", read - start)
+        metrics.add_time("decompression", time.perf_counter() - read)
+    return [(idx, record) for idx, record in enumerate(records)
+            if isinstance(record, Message) and record.channel_id in channel_ids]
+
+
+def _iter_chunk_messages(mcap_path: Path, chunk_indexes, channel_ids, metrics: Optional[DecodeMetrics] = None,
+                         prefetch: int = PREFETCH_CHUNKS, threads: int = PREFETCH_THREADS):
+    """
+    Yields (chunk index, messages) of the given chunks in order, see _read_chunk_messages.
+    Up to prefetch chunks are read and decompressed ahead on a thread pool, each thread with its own
+    file handle, while the caller decodes the current chunk.
+    """
+    local = threading.local()
+    streams = []
+
+    def read_chunk(chunk_index):
+        if not hasattr(local, "stream"):
+            local.stream = open(mcap_path, "rb")
+            streams.append(local.stream)
+        # counted per chunk and merged by the caller, metrics are not shared between threads
+        chunk_metrics = DecodeMetrics()
+        return _read_chunk_messages(local.stream, chunk_index, channel_ids, chunk_metrics), chunk_metrics
+
+    chunk_indexes = iter(chunk_indexes)
+    pending = collections.deque()
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            try:
+                for chunk_index in itertools.islice(chunk_indexes, prefetch):
+                    pending.append((chunk_index, pool.submit(read_chunk, chunk_index)))
+
+                while pending:
+                    chunk_index, future = pending.popleft()
+                    messages, chunk_metrics = future.result()
+                    for next_index in itertools.islice(chunk_indexes, 1):
+                        pending.append((next_index, pool.submit(read_chunk, next_index)))
+
+                    if metrics is not None:
+                        metrics.merge(chunk_metrics)
+                    yield chunk_index, messages
+            finally:
+                # stopped early, e.g. at the message count of the summary
+                for _, future in pending:
+                    future.cancel()
+    finally:
+        for stream in streams:
+            stream.close()
+
+
+def _chunks_in_order(chunk_indexes):
+    """
+    Returns True if the chunks, sorted by start time and offset, hold disjoint log time ranges,
+    so reading them one after another gives the message order of mcap iter_messages.
+    """
+    for previous, chunk_index in zip(chunk_indexes, chunk_indexes[1:]):
+        if chunk_index.message_start_time < previous.message_end_time:
+            return False
+        if chunk_index.message_start_time == previous.message_end_time and \
+                chunk_index.chunk_start_offset < previous.chunk_start_offset:
+            return False
+    return True
+
+
+def _file_fingerprint(mcap_path: Path):
+    """
+    Returns a sampled content fingerprint of an mcap file.
+    Hashes the file size, the start of the file and the summary section (or the end of the file
+    if there is no summary), which contains the chunk indexes and statistics of the whole file.
+    """
+    file_size = os.path.getsize(mcap_path)
+
+    h = hashlib.sha256(str(file_size).encode())
+    with open(mcap_path, "rb") as f:
+        h.update(f.read(FINGERPRINT_SIZE))
+
+        # summary start offset of the footer record: opcode, length, summary start, offset start, crc, magic
+        f.seek(max(file_size - 28, 0))
+        summary_start = struct.unpack("<Q", f.read(8).ljust(8, b"\0"))[0]
+        if summary_start <= 0 or summary_start >= file_size or file_size - summary_start > FINGERPRINT_SIZE:
+            summary_start = max(file_size - FINGERPRINT_SIZE, 0)
+
+        f.seek(summary_start)
+        h.update(f.read())
+
+    return h.hexdigest()
+
+
+def _compact_data(data, field_dtypes):
+    """
+    Converts a structured array to narrower types: float32 for numbers, the smallest integer type
+    holding all values for integers and dictionary codes for strings. Returns the compact array
+    and the dictionaries of the string fields as field name to list of strings.
+    """
+    np_struct_format = []
+    columns = {}
+    categories = {}
+    for field in data.dtype.names:
+        column = data[field]
+        json_type = field_dtypes.get(field) if field != "ts" else None
+
+        if json_type in ("number", "array"):
+            column = column.astype(np.float32)
+        elif json_type == "integer":
+            if len(column):
+                dtype = np.promote_types(np.min_scalar_type(column.min()), np.min_scalar_type(column.max()))
+            else:
+                dtype = np.int8
+            column = column.astype(dtype)
+        elif json_type == "string":
+            values, column = np.unique(column, return_inverse=True)
+            column = column.ravel().astype(np.min_scalar_type(max(len(values) - 1, 0)))
+            categories[field] = [x.decode('latin-1') for x in values.tolist()]
+
+        np_struct_format.append((field, column.dtype))
+        columns[field] = column
+
+    compact = np.zeros((len(data),), dtype=np_struct_format)
+    for field, column in columns.items():
+        compact[field] = column
+
+    return compact, categories
+
+
+def _append_npy(np_file: Path, rows):
+    """
+    Appends rows to a one dimensional numpy file. The header is rewritten in place
+    if its size does not change, otherwise the whole file is rewritten.
+    """
+    with open(np_file, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        header_size = f.tell()
+
+        header = io.BytesIO()
+        header_dict = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": fortran_order,
+                       "shape": (shape[0] + len(rows),)}
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(header, header_dict)
+        else:
+            np.lib.format.write_array_header_2_0(header, header_dict)
+
+        if len(header.getvalue()) == header_size:
+            f.seek(0, io.SEEK_END)
+            f.write(np.ascontiguousarray(rows, dtype=dtype).tobytes())
+            f.seek(0)
+            f.write(header.getvalue())
+            return
+
+    data = np.concatenate([np.load(np_file), rows.astype(dtype)])
+    tmp_file = np_file.with_suffix(".npy.tmp")
+    with open(tmp_file, 'wb') as f:
+        np.save(f, data)
+    os.replace(tmp_file, np_file)
+
+
+def _split_chunks(chunk_indexes, num_groups):
+    """
+    Splits a list of chunk indexes into at most num_groups contiguous groups
+    of about the same uncompressed size.
+    """
+    total_size = sum(x.uncompressed_size for x in chunk_indexes)
+    group_size = max(total_size / max(num_groups, 1), 1)
+
+    groups = []
+    group = []
+    size = 0
+    for chunk_index in chunk_indexes:
+        group.append(chunk_index)
+        size += chunk_index.uncompressed_size
+        if size >= group_size:
+            groups.append(group)
+            group = []
+            size = 0
+
+    if group:
+        groups.append(group)
+
+    return groups
+
+
+def _iter_records(stream, offset: int, end: int):
+    """
+    Yields (offset, opcode, body) of the complete records between offset and end.
+    Stops at the first cut off or invalid record, e.g. at the end of a recording interrupted by a crash.
+    """
+    stream.seek(offset)
+    while offset + 9 <= end:
+        opcode, length = struct.unpack("<BQ", stream.read(9))
+        if opcode == 0 or offset + 9 + length > end:
+            return
+        yield offset, opcode, stream.read(length)
+        offset += 9 + length
+
+
+def _prefix_fingerprint(stream, size: int):
+    """
+    Returns a sampled fingerprint of the first size bytes of an mcap file, see _file_fingerprint.
+    """
+    h = hashlib.sha256(str(size).encode())
+    stream.seek(0)
+    h.update(stream.read(min(size, FINGERPRINT_SIZE)))
+    stream.seek(max(size - FINGERPRINT_SIZE, 0))
+    h.update(stream.read(size - stream.tell()))
+    return h.hexdigest()
+
+
+def _scan_summary(stream, end: int, summary: Optional[mcap.summary.Summary] = None, offset: int = MAGIC_SIZE):
+    """
+    Rebuilds the summary of an mcap file from its data section: schemas, channels, statistics and chunk indexes.
+    Continues a given summary scanned up to offset. Returns the summary and the offset after the last complete
+    record. Only messages inside chunks are indexed, like the files written by mcap.writer.Writer.
+    """
+    if summary is None:
+        summary = mcap.summary.Summary()
+        summary.statistics = Statistics(attachment_count=0, channel_count=0, channel_message_counts={},
+                                        chunk_count=0, message_count=0, message_end_time=0,
+                                        message_start_time=0, metadata_count=0, schema_count=0)
+    statistics = summary.statistics
+
+    for record_offset, opcode, body in _iter_records(stream, offset, end):
+        if opcode == Opcode.DATA_END:
+            break
+        elif opcode == Opcode.SCHEMA:
+            schema = Schema.read(ReadDataStream(io.BytesIO(body)))
+            summary.schemas[schema.id] = schema
+        elif opcode == Opcode.CHANNEL:
+            channel = Channel.read(ReadDataStream(io.BytesIO(body)))
+            summary.channels[channel.id] = channel
+        elif opcode == Opcode.CHUNK:
+            try:
+                chunk = Chunk.read(ReadDataStream(io.BytesIO(body)))
+                records = breakup_chunk(chunk, validate_crc=True)
+            except Exception:
+                # a chunk that was not completely written ends the recording
+                break
+
+            message_counts = {}
+            for record in records:
+                if isinstance(record, Message):
+                    message_counts[record.channel_id] = message_counts.get(record.channel_id, 0) + 1
+                elif isinstance(record, Schema):
+                    summary.schemas[record.id] = record
+                elif isinstance(record, Channel):
+                    summary.channels[record.id] = record
+
+            if message_counts:
+                if statistics.message_count == 0:
+                    statistics.message_start_time = chunk.message_start_time
+                    statistics.message_end_time = chunk.message_end_time
+                statistics.message_start_time = min(statistics.message_start_time, chunk.message_start_time)
+                statistics.message_end_time = max(statistics.message_end_time, chunk.message_end_time)
+                statistics.message_count += sum(message_counts.values())
+                for channel_id, count in message_counts.items():
+                    statistics.channel_message_counts[channel_id] = \
+                        statistics.channel_message_counts.get(channel_id, 0) + count
+
+            # offset 0 marks a channel whose message index record is missing
+            summary.chunk_indexes.append(ChunkIndex(
+                message_start_time=chunk.message_start_time, message_end_time=chunk.message_end_time,
+                chunk_start_offset=record_offset, chunk_length=9 + len(body),
+                message_index_offsets={x: 0 for x in message_counts}, message_index_length=0,
+                compression=chunk.compression, compressed_size=len(chunk.data),
+                uncompressed_size=chunk.uncompressed_size))
+        elif opcode == Opcode.MESSAGE_INDEX:
+            # message index records directly follow their chunk
+            chunk_index = summary.chunk_indexes[-1] if summary.chunk_indexes else None
+            if chunk_index is not None and record_offset == \
+                    chunk_index.chunk_start_offset + chunk_index.chunk_length + chunk_index.message_index_length:
+                chunk_index.message_index_offsets[struct.unpack("<H", body[:2])[0]] = record_offset
+                chunk_index.message_index_length += 9 + len(body)
+        elif opcode == Opcode.ATTACHMENT:
+            statistics.attachment_count += 1
+        elif opcode == Opcode.METADATA:
+            statistics.metadata_count += 1
+
+        offset = record_offset + 9 + len(body)
+
+    statistics.schema_count = len(summary.schemas)
+    statistics.channel_count = len(summary.channels)
+    statistics.chunk_count = len(summary.chunk_indexes)
+
+    return summary, offset
+
+
+def _read_index(index_file: Path, stream, file_size: int):
+    """
+    Reads a sidecar index written by _write_index. Returns the summary and the scanned offset,
+    or (None, MAGIC_SIZE) if there is no index or the scanned part of the file has changed.
+    """
+    if not os.path.exists(index_file):
+        return None, MAGIC_SIZE
+
+    summary = mcap.summary.Summary()
+    manifest = {}
+    with open(index_file, 'rb') as f:
+        for _, opcode, body in _iter_records(f, 0, os.path.getsize(index_file)):
+            data_stream = ReadDataStream(io.BytesIO(body))
+            if opcode == Opcode.METADATA:
+                manifest = Metadata.read(data_stream).metadata
+            elif opcode == Opcode.SCHEMA:
+                schema = Schema.read(data_stream)
+                summary.schemas[schema.id] = schema
+            elif opcode == Opcode.CHANNEL:
+                channel = Channel.read(data_stream)
+                summary.channels[channel.id] = channel
+            elif opcode == Opcode.CHUNK_INDEX:
+                summary.chunk_indexes.append(ChunkIndex.read(data_stream))
+            elif opcode == Opcode.STATISTICS:
+                summary.statistics = Statistics.read(data_stream)
+
+    if manifest.get("version") != str(INDEX_VERSION) or summary.statistics is None:
+        return None, MAGIC_SIZE
+    scanned_offset = int(manifest["scanned_offset"])
+    if file_size < scanned_offset or _prefix_fingerprint(stream, scanned_offset) != manifest["fingerprint"]:
+        return None, MAGIC_SIZE
+
+    return summary, scanned_offset
+
+
+def _write_index(index_file: Path, stream, summary: mcap.summary.Summary, scanned_offset: int):
+    """
+    Writes a rebuilt summary and the scanned offset of the mcap file as sidecar index,
+    a sequence of mcap summary records.
+    """
+    builder = RecordBuilder()
+    Metadata(name="index", metadata={
+        "version": str(INDEX_VERSION),
+        "scanned_offset": str(scanned_offset),
+        "fingerprint": _prefix_fingerprint(stream, scanned_offset),
+    }).write(builder)
+    for record in itertools.chain(summary.schemas.values(), summary.channels.values(), summary.chunk_indexes):
+        record.write(builder)
+    summary.statistics.write(builder)
+
+    # unique temporary file, other processes may write the same index at the same time
+    os.makedirs(index_file.parent, exist_ok=True)
+    fd, tmp_file = tempfile.mkstemp(suffix=".index.tmp", dir=index_file.parent)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(builder.end())
+    os.replace(tmp_file, index_file)
+
+
+class _IndexedReader(mcap.reader.SeekingReader):
+    """
+    Seeking reader of a file without summary section, which reads its messages through a summary
+    rebuilt by _scan_summary instead. Relies on SeekingReader getting schemas, channels and
+    chunk indexes through get_summary, as in mcap 1.5.
+    """
+    def __init__(self, stream, summary: Optional[mcap.summary.Summary] = None):
+        # SeekingReader checks the magic at the current position, the scan may have moved it
+        stream.seek(0)
+        super().__init__(stream)
+        self.summary = summary
+
+    def get_summary(self):
+        return self.summary
+
+
+def _pack_validity(validity):
+    """
+    Returns the validity of a structured bool array as bitmap of one row of bits per field.
+    """
+    rows = [validity[x] for x in validity.dtype.names]
+    if not rows:
+        return np.zeros((0, (len(validity) + 7) // 8), dtype=np.uint8)
+    return np.packbits(np.stack(rows), axis=1)
+
+
+def _unpack_validity(bitmap, fields, count: int):
+    """
+    Returns the structured bool array of count rows of a bitmap of _pack_validity.
+    """
+    validity = np.zeros((count,), dtype=[(x, np.bool_) for x in fields])
+    for idx, field in enumerate(fields):
+        validity[field] = np.unpackbits(bitmap[idx], count=count).view(np.bool_)
+    return validity
+
+
+def _scan_values(values, coerce_null: bool):
+    """
+    Finds the strings and null in a list of parsed number values by their types, searched in C by list.index,
+    so only the few invalid values are handled in python. Strings, and null if coerce_null, are replaced by 0
+    in place, as numeric strings would convert silently. Returns the indexes of the strings and null.
+    """
+    kinds = list(map(type, values))
+    invalid = []
+    for kind in (str, type(None)):
+        idx = -1
+        try:
+            while True:
+                idx = kinds.index(kind, idx + 1)
+                invalid.append(idx)
+                if kind is str or coerce_null:
+                    values[idx] = 0
+        except ValueError:
+            pass
+    return invalid
+
+
+def _number_table(rows, keys):
+    """
+    Returns the values of the given number keys of parsed rows as float64 table with one column per key
+    and the mask of the values sent as string (stored as 0) or null (NaN), see _scan_values.
+    Returns None if a key is missing in one of the rows.
+    """
+    # the repeated first key keeps itemgetter returning tuples for a single key
+    try:
+        values = list(itertools.chain.from_iterable(map(operator.itemgetter(*keys, keys[0]), rows)))
+    except KeyError:
+        return None
+
+    invalid = np.zeros((len(values),), dtype=np.bool_)
+    invalid[_scan_values(values, False)] = True
+    table = np.asarray(values, dtype=np.float64).reshape(len(rows), len(keys) + 1)[:, :-1]
+    return table, invalid.reshape(table.shape[0], len(keys) + 1)[:, :-1]
+
+
+def _mark_offline(data, validity, devices):
+    """
+    Marks the value fields of a device (see McapTopic.get_devices) invalid in the messages in which all of them
+    are OFFLINE_VALUE, the report of an offline Shelly. A single field at OFFLINE_VALUE is a real reading,
+    e.g. -1 W of active power.
+    """
+    for fields in devices.values():
+        fields = [x for x in fields if x in validity.dtype.names]
+        if not fields:
+            continue
+        offline = data[fields[0]] == OFFLINE_VALUE
+        for field in fields[1:]:
+            offline &= data[field] == OFFLINE_VALUE
+        for field in fields:
+            validity[field] &= ~offline
+    return validity
+
+
+def _value_validity(data, fields, devices):
+    """
+    Returns the validity of the given fields of decoded data as structured bool array,
+    False for NaN and offline devices (see _mark_offline), the values still recognizable after decoding.
+    """
+    validity = np.ones((len(data),), dtype=[(x, np.bool_) for x in fields])
+    for field in fields:
+        if data.dtype[field].kind == "f":
+            validity[field] = ~np.isnan(data[field])
+    return _mark_offline(data, validity, devices)
+
+
+def _gap_runs(available, ts):
+    """
+    Returns the runs of rows without available value as (start, end, start_ts, end_ts) arrays, see GAP_FORMAT.
+    """
+    edges = np.diff(np.concatenate(([0], (~available).view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    end_ts = ts[np.minimum(ends, len(ts) - 1)] if len(ts) else np.zeros((0,), dtype=np.uint64)
+    return starts, ends, ts[starts], end_ts
+
+
+def _prepare_cache_dir(cache_dir: Path):
+    """
+    Creates an empty cache_dir for a cache written by _write_manifest, e.g. a columnar cache or pyramid.
+    An existing folder is only replaced if it holds a manifest or the marker of an interrupted build,
+    any other non-empty folder raises FileExistsError instead of deleting files of someone else.
+    """
+    cache_dir = Path(cache_dir)
+    if os.path.isdir(cache_dir) and os.listdir(cache_dir):
+        if not (os.path.exists(cache_dir / "manifest.json") or os.path.exists(cache_dir / CACHE_MARKER)):
+            raise FileExistsError(f"{cache_dir} is not empty and is no cache, refusing to replace it")
+        shutil.rmtree(cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    open(cache_dir / CACHE_MARKER, 'w').close()
+
+
+def _write_manifest(cache_dir: Path, manifest):
+    """
+    Writes the manifest of a cache prepared by _prepare_cache_dir. Written last, an interrupted build
+    leaves no valid cache but its marker, so the next build replaces it.
+    """
+    with open(Path(cache_dir) / "manifest.json", 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.remove(Path(cache_dir) / CACHE_MARKER)
 
 
 class McapTopic:
-    def __init__(self, reader: mcap.reader.McapReader, mcap_path: Path, topic_key: int):
+    def __init__(self, reader: mcap.reader.McapReader, mcap_path: Path, topic_key: int,
+                 numpy_dir: Optional[Path] = None, compact: bool = False, progress=print_progress,
+                 metrics: Optional[DecodeMetrics] = None):
         self._reader = reader
         self._mcap_path = mcap_path
         self._mcap_folder = mcap_path.parent
-        self._numpy_dir = self._mcap_folder / "numpy"
+        self._numpy_dir = self._mcap_folder / "numpy" if numpy_dir is None else numpy_dir
         self._topic_key = topic_key
-        self._topic = self._reader.get_summary().channels[topic_key].topic
-        self._message_count = reader.get_summary().statistics.channel_message_counts[topic_key]
-        self._schema = json.loads(reader.get_summary().schemas[topic_key].data.decode('utf-8'))
+        self._summary = reader.get_summary()
+        self._topic = self._summary.channels[topic_key].topic
+        self._message_count = self._summary.statistics.channel_message_counts[topic_key]
+        self._message_encoding = self._summary.channels[topic_key].message_encoding
+        self._message_class = None
+        self._repeated_fields = set()
+        self._implicit_fields = set()
+        self._schema = self._parse_schema(self._summary.schemas[self._summary.channels[topic_key].schema_id])
         self._fields = [x.replace(".", "_") for x in self._schema['properties'].keys()]
         self._dtypes = [x['type'] for x in self._schema['properties'].values()]
         self._field_dtypes = {k: v for k, v in zip(self._fields, self._dtypes)}
+        self._json_keys = {k: k.replace(".", "_") for k in self._schema['properties'].keys()}
         self._np_dtype = {'integer': np.int64, 'number': np.float64, 'boolean': np.bool_, "string": "S80", "array": np.float64}
+        self._compact = compact
+        self._categories = {}
+        self._progress = progress
+        self._metrics = DecodeMetrics() if metrics is None else metrics
+
+    def _parse_schema(self, schema):
+        """
+        Returns the fields of the topic as json schema, read from a json schema or a protobuf schema
+        depending on the message encoding of the channel, see MESSAGE_ENCODINGS.
+        """
+        if self._message_encoding not in MESSAGE_ENCODINGS:
+            raise ValueError(f"Unsupported message encoding {self._message_encoding} of topic {self._topic}")
+        if schema.encoding != MESSAGE_ENCODINGS[self._message_encoding]:
+            raise ValueError(f"Unsupported schema encoding {schema.encoding} for {self._message_encoding} "
+                             f"messages of topic {self._topic}")
+
+        if schema.encoding == "protobuf":
+            self._message_class, json_schema, self._repeated_fields, self._implicit_fields = _protobuf_schema(schema)
+            return json_schema
+
+        return json.loads(schema.data.decode('utf-8'))
+
+    def _parse_payloads(self, payloads):
+        """
+        Parses a block of message payloads into a list of dictionaries of key to value.
+        Binary encodings give the same values as json: protobuf fields with presence not set in a message
+        are missing, fields without presence take their default value and repeated fields are lists.
+        """
+        if self._message_encoding == "cbor":
+            import cbor2
+            return [cbor2.loads(x) for x in payloads]
+
+        if self._message_encoding == "protobuf":
+            rows = []
+            for payload in payloads:
+                message = self._message_class.FromString(payload)
+                row = {x: getattr(message, x) for x in self._implicit_fields}
+                row.update({k.name: list(v) if k.name in self._repeated_fields else v
+                            for k, v in message.ListFields()})
+                rows.append(row)
+            return rows
+
+        # parse the whole block as one json array instead of one call per message
+        return json.loads(b"[" + b",".join(payloads) + b"]")
+
+    def _report_progress(self, count: int, note: Optional[str] = None):
+        if self._progress is not None:
+            self._progress(self._topic, count, self._message_count, note)
 
     def get_fields(self):
         return self._fields
@@ -36,28 +764,351 @@ class McapTopic:
     def get_message_count(self):
         return self._message_count
 
+    def get_np_struct_format(self):
+        """
+        Returns the numpy structured array format holding the fields and the timestamp.
+        """
+        # create numpy structured array holding fields and timestamp
+        np_struct_format = [(x[0], self._np_dtype[x[1]]) for x in zip(self._fields, self._dtypes)]
+        np_struct_format.append(('ts', np.uint64))
+
+        # Remove duplicate ts field if present in mcap schema
+        ts_fields = []
+        for idx, field in enumerate(np_struct_format):
+            if field[0] == "ts":
+                ts_fields.append(idx)
+        if len(ts_fields) > 1:
+            np_struct_format.pop(ts_fields[0])
+
+        return np_struct_format
+
+    def _np_file(self):
+        return self._numpy_dir / (self._topic + ".npy")
+
+    def _manifest_file(self):
+        return self._numpy_dir / (self._topic + ".json")
+
+    def _validity_file(self):
+        return self._numpy_dir / (self._topic + ".valid.npy")
+
+    def _gaps_file(self):
+        return self._numpy_dir / (self._topic + ".gaps.npy")
+
+    def get_value_fields(self, np_struct_format=None):
+        """
+        Returns the number and integer fields of a format (default: get_np_struct_format),
+        the fields with a validity bitmap.
+        """
+        if np_struct_format is None:
+            np_struct_format = self.get_np_struct_format()
+        return [x[0] for x in np_struct_format
+                if x[0] != "ts" and self._field_dtypes.get(x[0]) in ("number", "integer")]
+
+    def get_devices(self):
+        """
+        Returns the devices of the topic as dictionary of device name to its value fields.
+        Shelly topics name a device by a <device>_device field and its values <device>_<field>,
+        other topics are one device named like the topic.
+        """
+        value_fields = self.get_value_fields()
+        names = [x[:-len("_device")] for x in self._fields if x.endswith("_device")]
+        devices = {x: [y for y in value_fields if y.startswith(x + "_")] for x in names}
+        devices = {k: v for k, v in devices.items() if v}
+        if not devices:
+            devices = {self._topic: value_fields}
+        return devices
+
+    def _cache_manifest(self):
+        """
+        Returns the manifest describing the current mcap file and topic schema,
+        which is stored next to the numpy file to detect stale caches.
+        """
+        stat = os.stat(self._mcap_path)
+        return {
+            "version": CACHE_VERSION,
+            "source_size": stat.st_size,
+            "source_mtime_ns": stat.st_mtime_ns,
+            "fingerprint": _file_fingerprint(self._mcap_path),
+            "topic": self._topic,
+            "compact": self._compact,
+            "schema": self._schema,
+            "dtype": json.loads(json.dumps(np.lib.format.dtype_to_descr(np.dtype(self.get_np_struct_format())))),
+        }
+
+    def _read_manifest(self):
+        """
+        Returns the stored cache manifest, or None if there is no readable one.
+        """
+        manifest_file = self._manifest_file()
+        if not os.path.exists(self._np_file()) or not os.path.exists(manifest_file):
+            return None
+
+        with open(manifest_file, 'r') as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return None
+
+    def _refresh_state(self, chunk_indexes):
+        """
+        Returns the position of the decoded chunks of the topic, stored in the manifest
+        so chunks appended to the mcap file later can be decoded on their own, see _refresh_data_npy.
+        """
+        chunk_positions = [(x.chunk_start_offset, x.chunk_length, x.message_start_time, x.message_end_time)
+                           for x in chunk_indexes]
+        return {
+            "chunks_hash": hashlib.sha256(json.dumps(chunk_positions).encode()).hexdigest(),
+            "last_chunk_end": max((x.chunk_start_offset + x.chunk_length for x in chunk_indexes), default=0),
+            "last_log_time": max((x.message_end_time for x in chunk_indexes), default=0),
+        }
+
+    def _valid_manifest(self):
+        """
+        Returns the stored cache manifest if it matches the current mcap file, otherwise None.
+        """
+        manifest = self._read_manifest()
+        if manifest is None:
+            return None
+
+        source_manifest = {k: v for k, v in manifest.items() if k not in ("refresh", "compact_dtype", "categories")}
+        if source_manifest != self._cache_manifest():
+            return None
+
+        return manifest
+
+    def has_cached_data(self):
+        """
+        Returns True if the topic data is cached as numpy file matching the current mcap file.
+        """
+        return self._valid_manifest() is not None
+
     def _load_data_npy(self):
-        np_file = self._numpy_dir / (self._topic + ".npy")
+        """
+        Returns the cached topic data memory mapped read-only, or None if there is no valid cache.
+        """
+        manifest = self._valid_manifest()
+        if manifest is None:
+            return None
 
-        if os.path.exists(np_file):
-            with open(np_file, 'rb') as f:
-                return np.load(f)
+        if self._compact:
+            dtype = np.lib.format.descr_to_dtype([tuple(x) for x in manifest["compact_dtype"]])
+            self._categories = manifest["categories"]
+        else:
+            dtype = np.dtype(self.get_np_struct_format())
 
-        return None
+        data = np.load(self._np_file(), mmap_mode='r')
+        if data.dtype != dtype:
+            return None
+
+        return data
+
+    def get_categories(self):
+        """
+        Returns the dictionaries of the string fields of compact data as field name to numpy array,
+        the string values of a field are get_categories()[field][data[field]].
+        """
+        if self._compact and not self._categories:
+            self._load_data_npy()
+        return {k: np.array([x.encode('latin-1') for x in v], dtype="S80") for k, v in self._categories.items()}
+
+    def _write_manifest(self, data):
+        manifest = self._cache_manifest()
+        if self._compact:
+            # chosen dtypes depend on the data, appended chunks could need wider types
+            manifest["compact_dtype"] = json.loads(json.dumps(np.lib.format.dtype_to_descr(data.dtype)))
+            manifest["categories"] = self._categories
+        elif self._summary.chunk_indexes and "oscilloscope" not in self._topic:
+            manifest["refresh"] = self._refresh_state(self._get_chunk_indexes())
+            manifest["refresh"]["last_publish_time"] = int(data['ts'][-1]) if len(data) else 0
+
+        with open(self._manifest_file(), 'w') as f:
+            json.dump(manifest, f, indent=1)
+
+    def _save_validity(self, data, validity=None):
+        """
+        Stores the validity bitmap of the value fields and the gap index of the devices of the topic data
+        (see get_validity and get_gaps). Without decoded validity only offline devices and NaN mark invalid values.
+        """
+        if validity is None:
+            validity = _value_validity(data, self.get_value_fields(), self.get_devices())
+
+        gaps = []
+        for idx, fields in enumerate(self.get_devices().values()):
+            available = np.zeros((len(data),), dtype=np.bool_)
+            for field in fields:
+                available |= validity[field]
+            starts, ends, start_ts, end_ts = _gap_runs(available, data['ts'])
+            device_gaps = np.zeros((len(starts),), dtype=GAP_FORMAT)
+            device_gaps['device'] = idx
+            device_gaps['start'] = starts
+            device_gaps['end'] = ends
+            device_gaps['start_ts'] = start_ts
+            device_gaps['end_ts'] = end_ts
+            gaps.append(device_gaps)
+
+        np.save(self._validity_file(), _pack_validity(validity))
+        np.save(self._gaps_file(), np.concatenate(gaps) if gaps else np.zeros((0,), dtype=GAP_FORMAT))
+        return validity
+
+    def _load_validity(self):
+        """
+        Returns the cached validity bitmap of the value fields as structured bool array,
+        built from the cached data if missing.
+        """
+        data = self.get_data()
+        fields = self.get_value_fields()
+        if os.path.exists(self._validity_file()) and os.path.exists(self._gaps_file()):
+            bitmap = np.load(self._validity_file())
+            if bitmap.shape == (len(fields), (len(data) + 7) // 8):
+                return _unpack_validity(bitmap, fields, len(data))
+        return self._save_validity(data)
+
+    def get_validity(self, fields=None):
+        """
+        Returns the validity of the given value fields (default: all, see get_value_fields) of get_data
+        as dictionary of field name to bool array. A value is invalid if it was missing in its message,
+        sent as string or its device was offline (see _mark_offline). Stored as bitmap next to the numpy cache while decoding.
+        """
+        validity = self._load_validity()
+        return {x: validity[x] for x in (validity.dtype.names if fields is None else fields)}
+
+    def get_gaps(self, device: Optional[str] = None):
+        """
+        Returns the gap index of the topic (see GAP_FORMAT) as dictionary of device name (see get_devices)
+        to the runs of messages in which none of its value fields is valid, or only the gaps of one device.
+        """
+        self._load_validity()
+        gaps = np.load(self._gaps_file())
+        devices = {k: gaps[gaps['device'] == idx] for idx, k in enumerate(self.get_devices())}
+        return devices if device is None else devices[device]
+
+    def get_availability(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None):
+        """
+        Returns the fraction of messages with start_ns <= ts < end_ns in which a device has a valid value
+        as dictionary of device name to fraction, counted from the gap index.
+        """
+        ts = self.get_data()['ts']
+        # bounds compared as uint64, as float64 they would lose the last digits of ns timestamps
+        first = 0 if start_ns is None else int(np.searchsorted(ts, np.uint64(max(start_ns, 0))))
+        last = len(ts) if end_ns is None else int(np.searchsorted(ts, np.uint64(max(end_ns, 0))))
+        availability = {}
+        for device, gaps in self.get_gaps().items():
+            missing = np.clip(gaps['end'].astype(np.int64), first, last) - np.clip(gaps['start'].astype(np.int64),
+                                                                                   first, last)
+            availability[device] = 1.0 - missing.sum() / max(last - first, 1)
+        return availability
+
+    def _save_data_npy(self, data, validity=None):
+        """
+        Stores the topic data as numpy file with its validity (see _save_validity)
+        and writes its manifest afterwards, so an interrupted write never leaves a valid looking cache.
+        """
+        # create numpy folder if not exists, parallel workers may create it at the same time
+        os.makedirs(self._numpy_dir, exist_ok=True)
+
+        manifest_file = self._manifest_file()
+        if os.path.exists(manifest_file):
+            os.remove(manifest_file)
+
+        # store numpy data for topic as numpy file
+        tmp_file = self._np_file().with_suffix(".npy.tmp")
+        with open(tmp_file, 'wb') as f:
+            np.save(f, data)
+        os.replace(tmp_file, self._np_file())
+
+        self._save_validity(data, validity)
+        self._write_manifest(data)
+
+    def _refresh_data_npy(self):
+        """
+        Decodes only the chunks appended to the mcap file since the cache was written and appends them
+        to the numpy file. Returns False if the cache can not be refreshed this way, e.g. because
+        the file was rewritten, the schema changed or new messages are older than cached ones.
+        """
+        manifest = self._read_manifest()
+        if manifest is None or "refresh" not in manifest or "oscilloscope" in self._topic:
+            return False
+
+        current = self._cache_manifest()
+        if any(manifest[k] != current[k] for k in ("version", "topic", "schema", "dtype")):
+            return False
+        if current["source_size"] < manifest["source_size"]:
+            return False
+
+        # the chunks decoded before must still be the same
+        refresh = manifest["refresh"]
+        chunk_indexes = self._get_chunk_indexes()
+        old_chunks = [x for x in chunk_indexes if x.chunk_start_offset < refresh["last_chunk_end"]]
+        new_chunks = [x for x in chunk_indexes if x.chunk_start_offset >= refresh["last_chunk_end"]]
+        old_state = self._refresh_state(old_chunks)
+        if old_state["chunks_hash"] != refresh["chunks_hash"]:
+            return False
+
+        # new messages must come after the cached ones in log time order
+        if any(x.message_start_time < refresh["last_log_time"] for x in new_chunks):
+            return False
+
+        np_struct_format = self.get_np_struct_format()
+        validity = []
+        keys, block = self._decode_chunks(new_chunks, np_struct_format, validity)
+        order = np.lexsort((keys['record_index'], keys['chunk_offset'], keys['log_time']))
+        block = block[order]
+
+        cached_data = np.load(self._np_file(), mmap_mode='r')
+        if len(cached_data) + len(block) != self._message_count:
+            return False
+
+        # validity of the cached rows, only offline devices and NaN are known for caches without bitmap
+        value_fields = self.get_value_fields()
+        bitmap = np.load(self._validity_file()) if os.path.exists(self._validity_file()) else None
+        if bitmap is not None and bitmap.shape == (len(value_fields), (len(cached_data) + 7) // 8):
+            cached_validity = _unpack_validity(bitmap, value_fields, len(cached_data))
+        else:
+            cached_validity = _value_validity(cached_data, value_fields, self.get_devices())
+        new_validity = np.concatenate(validity)[order] if validity else np.zeros((0,), dtype=cached_validity.dtype)
+        validity = np.concatenate([cached_validity, new_validity])
+
+        os.remove(self._manifest_file())
+        _append_npy(self._np_file(), block)
+        data = np.load(self._np_file(), mmap_mode='r')
+        self._save_validity(data, validity)
+        self._write_manifest(data)
+
+        self._report_progress(self._message_count, str(len(block)) + " new messages appended to cache")
+        return True
 
     def get_data_list(self):
         """
         Returns its topic data as a dictionary of python lists.
+        Every field keeps its own type, see get_columns.
         """
         list_data = {}
         np_data = self.get_data()
-        print("Converting to list...", end="")
-        transposed_data = np.vstack([np_data[x] for x in np_data.dtype.names])
-        for idx, fieldname in enumerate(np_data.dtype.names):
-            list_data[fieldname] = transposed_data[idx].tolist()
-        print(" finished.")
+        for fieldname, column in self.get_columns(np_data).items():
+            list_data[fieldname] = column.tolist()
+        self._report_progress(self._message_count, "converted to list")
         return list_data
 
+    def get_columns(self, data=None):
+        """
+        Returns the topic data (default: get_data) as a dictionary of field name to numpy array.
+        The arrays are views into the structured array, no data is copied.
+        """
+        if data is None:
+            data = self.get_data()
+        return {x: data[x] for x in data.dtype.names}
+
+    def get_dataframe(self, data=None):
+        """
+        Returns the topic data (default: get_data) as pandas DataFrame with ts as datetime index.
+        The columns are built from the views of get_columns without copying the data.
+        """
+        import pandas as pd
+
+        columns = self.get_columns(data)
+        index = pd.DatetimeIndex(columns.pop('ts').view('datetime64[ns]'), name="ts")
+        return pd.DataFrame(columns, index=index, copy=False)
+
     def get_data_list_old(self):
         data = {x: [0] * self._message_count for x in self._fields}
         data['ts'] = [0] * self._message_count
@@ -83,20 +1134,239 @@ class McapTopic:
             # increment processed message count
             cnt += 1
 
-            # print progress
+            # report progress
             if cnt % mod == 0:
-                percent_str = str(int((cnt / self._message_count) * 100)) + "%"
-                print("\rLoading " + self._topic + ": " + percent_str, end="")
+                self._report_progress(cnt)
 
-        # print finished loading
-        print("\rLoading " + self._topic + ": 100%")
+        # report finished loading
+        self._report_progress(self._message_count)
 
         # return data dict
         return data
 
-    def get_default_data(self, np_struct_format):
+    def _iter_messages(self):
+        """
+        Yields the messages of the topic in the order of mcap iter_messages.
+        If the chunks of the topic do not overlap in log time, upcoming chunks are read and decompressed
+        on a thread pool while the current one is decoded, see _iter_chunk_messages.
+        Otherwise the messages come from iter_messages, whose time is counted as io.
+        """
+        chunk_indexes = sorted(self._get_chunk_indexes(), key=lambda x: (x.message_start_time, x.chunk_start_offset))
+        if self._summary.chunk_indexes and _chunks_in_order(chunk_indexes):
+            for chunk_index, messages in _iter_chunk_messages(self._mcap_path, chunk_indexes,
+                                                              self._get_channel_ids(), self._metrics):
+                # log time order inside of the chunk, sorted keeps the file order of equal log times
+                for _, message in sorted(messages, key=lambda x: x[1].log_time):
+                    yield message
+            return
+
+        start = time.perf_counter()
+        for schema, channel, message in self._reader.iter_messages(topics=[self._topic]):
+            self._metrics.add_time("io", time.perf_counter() - start)
+            yield message
+            start = time.perf_counter()
+
+    def _iter_message_blocks(self, block_size: int = DECODE_BLOCK_SIZE):
+        """
+        Yields the messages of the topic as blocks of (publish_times, payloads) lists
+        with at most block_size messages per block.
+        """
+        publish_times = []
+        payloads = []
+        for message in self._iter_messages():
+            publish_times.append(message.publish_time)
+            payloads.append(message.data)
+            if len(payloads) >= block_size:
+                yield publish_times, payloads
+                publish_times = []
+                payloads = []
+
+        if payloads:
+            yield publish_times, payloads
+
+    def _decode_block(self, publish_times, payloads, np_struct_format, validity=None):
+        """
+        Decodes a block of payloads (see _parse_payloads) into a structured array of the given format.
+        Every field is first collected into a column buffer and then checked and written in one step,
+        number fields sent in every message together as one table (see _number_table).
+        Fields missing in a message stay 0, a ts field overwrites the publish time,
+        string values of number and integer fields and null of integer fields are coerced to 0.
+        If a validity list is given, a structured bool array of the value fields (see get_value_fields)
+        is appended to it, False for missing values, null, NaN, string values and offline devices (see _mark_offline).
+        """
+        start = time.perf_counter()
+        self._metrics.add_messages(len(payloads), sum(map(len, payloads)))
+
+        rows = self._parse_payloads(payloads)
+        parsed = time.perf_counter()
+        self._metrics.add_time("json", parsed - start)
+
+        block = np.zeros((len(payloads),), dtype=np_struct_format)
+        block['ts'] = publish_times
+        valid = None
+        if validity is not None:
+            valid = np.ones((len(payloads),), dtype=[(x, np.bool_) for x in self.get_value_fields(np_struct_format)])
+            validity.append(valid)
+
+        # number fields sent in every message of the block are converted together
+        number_keys = {k: idx for idx, k in enumerate(k for k, v in self._json_keys.items()
+                                                      if v in block.dtype.names and self._field_dtypes[v] == "number"
+                                                      and block.dtype[v].kind == "f" and not block.dtype[v].shape)}
+        numbers = _number_table(rows, list(number_keys)) if number_keys and rows else None
+
+        for key, field in self._json_keys.items():
+            if field not in block.dtype.names:
+                continue
+
+            if numbers is not None and key in number_keys:
+                block[field] = numbers[0][:, number_keys[key]]
+                if valid is not None and field in valid.dtype.names:
+                    valid[field] &= ~numbers[1][:, number_keys[key]]
+            else:
+                # collect the column, fields missing in a message keep their initial value
+                try:
+                    rows_idx = slice(None)
+                    column = list(map(operator.itemgetter(key), rows))
+                except KeyError:
+                    rows_idx = list(itertools.compress(range(len(rows)), map(operator.contains, rows,
+                                                                             itertools.repeat(key))))
+                    column = [rows[idx][key] for idx in rows_idx]
+
+                if valid is not None and field in valid.dtype.names and not isinstance(rows_idx, slice):
+                    valid[field] = False
+                    valid[field][rows_idx] = True
+
+                # null of number fields becomes NaN, of integer fields 0
+                invalid = []
+                if self._field_dtypes[field] in ("number", "integer"):
+                    invalid = _scan_values(column, self._field_dtypes[field] == "integer")
+                if invalid and valid is not None and field in valid.dtype.names:
+                    valid[field][np.arange(len(rows))[rows_idx][invalid]] = False
+
+                block[field][rows_idx] = np.asarray(column, dtype=block.dtype[field])
+
+            if valid is not None and field in valid.dtype.names and block.dtype[field].kind == "f":
+                valid[field] &= ~np.isnan(block[field])
+
+        if valid is not None:
+            _mark_offline(block, valid, self.get_devices())
+
+        self._metrics.add_time("fill", time.perf_counter() - parsed)
+        return block
+
+    def get_default_data(self, np_struct_format, validity=None):
         """
         The default method to convert mcap data into numpy array data.
+        Messages are decoded in blocks, see _decode_block, which fill the optional validity list.
+        """
+        data = np.zeros((self._message_count,), dtype=np_struct_format)
+
+        # counts messages
+        cnt = 0
+
+        # iterate message blocks up to num_messages
+        for publish_times, payloads in self._iter_message_blocks():
+            block = self._decode_block(publish_times, payloads, np_struct_format, validity)
+
+            # store block, drop messages exceeding the message count of the summary
+            block = block[:self._message_count - cnt]
+            if validity is not None:
+                validity[-1] = validity[-1][:len(block)]
+            data[cnt:cnt + len(block)] = block
+
+            # increment processed message count
+            cnt += len(block)
+
+            # break if num messages have been stored
+            if cnt >= self._message_count:
+                break
+
+            # report progress
+            self._report_progress(cnt)
+
+        return data
+
+    def _get_channel_ids(self):
+        """
+        Returns the ids of all channels publishing on the topic.
+        """
+        return {k for k, v in self._summary.channels.items() if v.topic == self._topic}
+
+    def _get_chunk_indexes(self):
+        """
+        Returns the chunk indexes of the file summary that may contain messages of the topic.
+        """
+        channel_ids = self._get_channel_ids()
+        return [x for x in self._summary.chunk_indexes
+                if not x.message_index_offsets or channel_ids.intersection(x.message_index_offsets)]
+
+    def _decode_chunks(self, chunk_indexes, np_struct_format, validity=None):
+        """
+        Decodes the topic messages of the given chunks with its own file handles, see _iter_chunk_messages.
+        Returns the order keys (see ORDER_KEY_FORMAT) and the decoded structured array.
+        The validity of the blocks is appended to the optional validity list, see _decode_block.
+        """
+        keys = []
+        blocks = []
+
+        for chunk_index, messages in _iter_chunk_messages(self._mcap_path, chunk_indexes, self._get_channel_ids(),
+                                                          self._metrics):
+            if not messages:
+                continue
+
+            chunk_keys = np.zeros((len(messages),), dtype=ORDER_KEY_FORMAT)
+            chunk_keys['log_time'] = [x[1].log_time for x in messages]
+            chunk_keys['chunk_offset'] = chunk_index.chunk_start_offset
+            chunk_keys['record_index'] = [x[0] for x in messages]
+            keys.append(chunk_keys)
+
+            publish_times = [x[1].publish_time for x in messages]
+            payloads = [x[1].data for x in messages]
+            blocks.append(self._decode_block(publish_times, payloads, np_struct_format, validity))
+
+        if not blocks:
+            return np.zeros((0,), dtype=ORDER_KEY_FORMAT), np.zeros((0,), dtype=np_struct_format)
+
+        return np.concatenate(keys), np.concatenate(blocks)
+
+    def get_default_data_parallel(self, np_struct_format, workers: int, validity=None):
+        """
+        Chunk parallel version of get_default_data.
+        The chunks of the topic are split into groups which are decoded in a process pool,
+        the results are stitched into the data array in the message order of get_default_data.
+        """
+        chunk_groups = _split_chunks(self._get_chunk_indexes(), workers * CHUNK_GROUPS_PER_WORKER)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_decode_chunks_worker,
+                                    [str(self._mcap_path)] * len(chunk_groups),
+                                    [self._topic] * len(chunk_groups),
+                                    chunk_groups,
+                                    [np_struct_format] * len(chunk_groups),
+                                    [str(self._numpy_dir)] * len(chunk_groups)))
+
+        keys = np.concatenate([x[0] for x in results])
+        blocks = np.concatenate([x[1] for x in results])
+        for x in results:
+            self._metrics.merge(x[3])
+
+        # sort by log time, then by position in file like mcap iter_messages
+        order = np.lexsort((keys['record_index'], keys['chunk_offset'], keys['log_time']))
+        order = order[:self._message_count]
+
+        data = np.zeros((self._message_count,), dtype=np_struct_format)
+        np.take(blocks, order, out=data[:len(order)])
+
+        if validity is not None:
+            block_validity = np.concatenate([x[2] for x in results])
+            validity.append(np.ones((self._message_count,), dtype=block_validity.dtype))
+            np.take(block_validity, order, out=validity[-1][:len(order)])
+
+        return data
+
+    def get_default_data_old(self, np_struct_format):
+        """
+        Per-message version of get_default_data, kept for comparison benchmarks.
         """
         data = np.zeros((self._message_count,), dtype=np_struct_format)
 
@@ -128,16 +1398,101 @@ class McapTopic:
             if cnt >= self._message_count:
                 break
 
-            # print progress
+            # report progress
             if cnt % mod == 0:
-                percent_str = str(int((cnt / self._message_count) * 100)) + "%"
-                print("\rLoading " + self._topic + ": " + percent_str, end="")
+                self._report_progress(cnt)
 
         return data
 
+    def _decode_oscilloscope_block(self, publish_times, payloads, np_struct_format):
+        """
+        Decodes a block of oscilloscope payloads (see _parse_payloads) into a structured array with one row per sample.
+        Window i fills the rows offsets[i]:offsets[i + 1], so windows may have different lengths.
+        List fields are copied as whole windows, other fields are repeated for every sample of a window
+        and ts is the publish time plus rel_time of the sample.
+        """
+        start = time.perf_counter()
+        self._metrics.add_messages(len(payloads), sum(len(x) for x in payloads))
+
+        rows = self._parse_payloads(payloads)
+        parsed = time.perf_counter()
+        self._metrics.add_time("json", parsed - start)
+
+        # offsets index of the windows inside of the block
+        lengths = np.array([len(row["rel_time"]) for row in rows], dtype=np.int64)
+        offsets = np.zeros((len(rows) + 1,), dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        block = np.zeros((offsets[-1],), dtype=np_struct_format)
+
+        # ts of every sample, integer relative times are added exactly and float ones in float64
+        rel_time = list(itertools.chain.from_iterable(row["rel_time"] for row in rows))
+        is_int = np.array([type(x) is int for x in rel_time], dtype=np.bool_)
+        rel_time = np.asarray(rel_time, dtype=np.float64)
+        publish_times = np.repeat(np.asarray(publish_times, dtype=np.int64), lengths)
+        if not is_int.all():
+            block['ts'] = publish_times.astype(np.float64) + rel_time
+        if is_int.any():
+            block['ts'][is_int] = publish_times[is_int] + rel_time[is_int].astype(np.int64)
+
+        for key, field in self._json_keys.items():
+            if field == "ts" or field not in block.dtype.names:
+                continue
+
+            values = [row.get(key) for row in rows]
+            if all(type(v) is list for v in values):
+                # whole windows of every message
+                block[field] = np.asarray(list(itertools.chain.from_iterable(values)), dtype=block.dtype[field])
+            elif all(key in row and type(row[key]) is not list for row in rows):
+                # one value per window
+                block[field] = np.repeat(np.asarray(values, dtype=block.dtype[field]), lengths)
+            else:
+                # mixed or missing values, fill window by window
+                for idx, v in enumerate(values):
+                    if key in rows[idx]:
+                        block[field][offsets[idx]:offsets[idx + 1]] = v
+
+        self._metrics.add_time("fill", time.perf_counter() - parsed)
+        return block
+
     def get_oscilloscope_data(self, np_struct_format):
         """
         A method to convert oscilloscope mcap data into numpy array data.
+        The data must be shaped in the following strucure and must have the following keys:
+            rel_time [array] (The relative time since the oscilloscope window started)
+            data1 [array]
+            dataX... (as many data arrays per window of the same size as rel_time)
+        Windows may have different lengths, see _decode_oscilloscope_block.
+        """
+        blocks = []
+
+        # counts messages
+        cnt = 0
+
+        # iterate message blocks up to num_messages
+        for publish_times, payloads in self._iter_message_blocks():
+            payloads = payloads[:self._message_count - cnt]
+            blocks.append(self._decode_oscilloscope_block(publish_times[:len(payloads)], payloads,
+                                                          np_struct_format))
+
+            # increment processed message count
+            cnt += len(payloads)
+
+            # break if num messages have been stored
+            if cnt >= self._message_count:
+                break
+
+            # report progress
+            self._report_progress(cnt)
+
+        if not blocks:
+            return np.zeros((0,), dtype=np_struct_format)
+
+        return np.concatenate(blocks)
+
+    def get_oscilloscope_data_old(self, np_struct_format):
+        """
+        Per-sample version of get_oscilloscope_data assuming equal window sizes, kept for comparison benchmarks.
         The data must be shaped in the following strucure and must have the following keys:
             rel_time [array] (The relative time since the oscilloscope window started)
             data1 [array]
@@ -180,52 +1535,165 @@ class McapTopic:
             if cnt >= self._message_count:
                 break
 
-            # print progress
+            # report progress
             if cnt % mod == 0:
-                percent_str = str(int((cnt / self._message_count) * 100)) + "%"
-                print("\rLoading " + self._topic + ": " + percent_str, end="")
+                self._report_progress(cnt)
 
         return data
 
-    def get_data(self):
+    def _query_data(self, start_ns: Optional[int], end_ns: Optional[int], fields):
+        """
+        Returns only the messages with start_ns <= ts < end_ns and only the given fields plus ts.
+        A valid cache is sliced, otherwise only the chunks overlapping the window are decoded.
+        Chunks are selected by their log time range, which is the publish time of our recordings.
+        Oscilloscope topics are decoded through the cache and return the samples inside of the window.
+        """
+        cached_data = self._load_data_npy()
+        if cached_data is None and ("oscilloscope" in self._topic or self._compact):
+            # oscilloscope windows expand to several rows per message and compact dtypes
+            # are chosen from the whole topic, decode them through the cache
+            cached_data = self.get_data()
+
+        full_format = dict(self.get_np_struct_format() if cached_data is None else cached_data.dtype.descr)
+        fields = [x for x in (full_format if fields is None else fields) if x != "ts"]
+        np_struct_format = [(x, full_format[x]) for x in fields] + [('ts', np.uint64)]
+
+        self._metrics.add_cache_access(self._topic, cached_data is not None)
+        if cached_data is not None:
+            self._report_progress(self._message_count, "cached numpy file")
+            ts = cached_data['ts']
+            chunk_data = None
+        else:
+            start = time.perf_counter()
+            chunk_indexes = [x for x in self._get_chunk_indexes()
+                             if (start_ns is None or x.message_end_time >= start_ns) and
+                             (end_ns is None or x.message_start_time < end_ns)]
+            if self._summary.chunk_indexes:
+                keys, chunk_data = self._decode_chunks(chunk_indexes, np_struct_format)
+                chunk_data = chunk_data[np.lexsort((keys['record_index'], keys['chunk_offset'], keys['log_time']))]
+            else:
+                blocks = [self._decode_block(*x, np_struct_format) for x in self._iter_message_blocks()]
+                chunk_data = np.concatenate(blocks) if blocks else np.zeros((0,), dtype=np_struct_format)
+            ts = chunk_data['ts']
+            self._metrics.add_wall_time(time.perf_counter() - start)
+            self._report_progress(self._message_count)
+
+        if "oscilloscope" in self._topic and np.any(ts[1:] < ts[:-1]):
+            # samples of overlapping windows are not sorted, select them one by one
+            mask = np.ones(ts.shape, dtype=np.bool_)
+            if start_ns is not None:
+                mask &= ts >= start_ns
+            if end_ns is not None:
+                mask &= ts < end_ns
+            rows = np.flatnonzero(mask)
+            count = len(rows)
+        else:
+            # messages are in log time order, so ts is sorted and only the rows of the window are read,
+            # the bounds are compared as uint64, as float64 they would lose the last digits of ns timestamps
+            first = 0 if start_ns is None else int(np.searchsorted(ts, np.uint64(max(start_ns, 0))))
+            last = len(ts) if end_ns is None else int(np.searchsorted(ts, np.uint64(max(end_ns, 0))))
+            rows = slice(first, max(first, last))
+            count = max(first, last) - first
+
+        source = cached_data if cached_data is not None else chunk_data
+        data = np.zeros((count,), dtype=np_struct_format)
+        for field in data.dtype.names:
+            data[field] = source[field][rows]
+
+        return data
+
+    def iter_batches(self, batch_size: int = DECODE_BLOCK_SIZE, fields=None):
+        """
+        Yields the topic data as structured arrays of batch_size messages (the last one may be shorter)
+        holding the given fields plus ts. Messages are decoded block by block while iterating,
+        so the memory use does not depend on the size of the topic. A valid cache is sliced instead.
+        """
+        cached_data = self._load_data_npy()
+        if cached_data is None and ("oscilloscope" in self._topic or self._compact):
+            # oscilloscope windows expand to several rows per message and compact dtypes
+            # are chosen from the whole topic, decode them through the cache
+            cached_data = self.get_data()
+
+        full_format = dict(self.get_np_struct_format() if cached_data is None else cached_data.dtype.descr)
+        fields = [x for x in (full_format if fields is None else fields) if x != "ts"]
+        np_struct_format = [(x, full_format[x]) for x in fields] + [('ts', np.uint64)]
+
+        self._metrics.add_cache_access(self._topic, cached_data is not None)
+        if cached_data is not None:
+            for start in range(0, len(cached_data), batch_size):
+                rows = cached_data[start:start + batch_size]
+                batch = np.zeros((len(rows),), dtype=np_struct_format)
+                for field in batch.dtype.names:
+                    batch[field] = rows[field]
+                yield batch
+            return
+
+        cnt = 0
+        # wall time of reading and decoding, without the time the caller spends on a batch
+        start = time.perf_counter()
+        for publish_times, payloads in self._iter_message_blocks(batch_size):
+            batch = self._decode_block(publish_times, payloads, np_struct_format)
+
+            # drop messages exceeding the message count of the summary like get_default_data
+            batch = batch[:self._message_count - cnt]
+            cnt += len(batch)
+            self._metrics.add_wall_time(time.perf_counter() - start)
+            if len(batch):
+                yield batch
+            if cnt >= self._message_count:
+                break
+            start = time.perf_counter()
+
+    def get_data(self, workers: int = 1, start_ns: Optional[int] = None, end_ns: Optional[int] = None,
+                 fields=None):
+        """
+        Returns the topic data as numpy structured array, decoded from the mcap file or loaded from cache.
+        With workers > 1 the chunks of non-oscilloscope topics are decoded in a process pool.
+        With start_ns, end_ns or fields only that part of the data is returned, see _query_data.
+        """
+        if start_ns is not None or end_ns is not None or fields is not None:
+            return self._query_data(start_ns, end_ns, fields)
+
         # try to load cached data from disk
         temp_data = self._load_data_npy()
 
         # return given cached data
+        self._metrics.add_cache_access(self._topic, temp_data is not None)
         if temp_data is not None:
-            print("Loading " + self._topic + ": 100% (cached numpy file)")
+            self._report_progress(self._message_count, "cached numpy file")
             return temp_data
 
-        # create numpy structured array holding fields and timestamp
-        np_struct_format = [(x[0], self._np_dtype[x[1]]) for x in zip(self._fields, self._dtypes)]
-        np_struct_format.append(('ts', np.uint64))
+        # decode only new chunks if the mcap file has grown since caching
+        start = time.perf_counter()
+        if self._refresh_data_npy():
+            self._metrics.add_wall_time(time.perf_counter() - start)
+            return self._load_data_npy()
 
-        # Remove duplicate ts field if present in mcap schema
-        ts_fields = []
-        for idx, field in enumerate(np_struct_format):
-            if field[0] == "ts":
-                ts_fields.append(idx)
-        if len(ts_fields) > 1:
-            np_struct_format.pop(ts_fields[0])
+        np_struct_format = self.get_np_struct_format()
 
+        # oscilloscope windows have no decoded validity, see _save_validity
+        validity = []
         if "oscilloscope" in self._topic:
             data = self.get_oscilloscope_data(np_struct_format)
+        elif workers > 1 and self._summary.chunk_indexes:
+            data = self.get_default_data_parallel(np_struct_format, workers, validity)
         else:
-            data = self.get_default_data(np_struct_format)
+            data = self.get_default_data(np_struct_format, validity)
+        if validity:
+            validity = np.concatenate(validity)
+            if len(validity) < len(data):
+                validity = np.concatenate([validity, np.zeros((len(data) - len(validity),), dtype=validity.dtype)])
+        else:
+            validity = None
+        self._metrics.add_wall_time(time.perf_counter() - start)
 
-        # print finished loading
-        print("\rLoading " + self._topic + ": 100%")
+        # report finished loading
+        self._report_progress(self._message_count)
 
-        # create numpy file path for topic
-        np_file = self._numpy_dir / (self._topic + ".npy")
+        if self._compact:
+            data, self._categories = _compact_data(data, self._field_dtypes)
 
-        # create numpy folder if not exists
-        if not os.path.exists(self._numpy_dir):
-            os.mkdir(self._numpy_dir)
-
-        # store numpy data for topic as numpy file
-        with open(np_file, 'wb') as f:
-            np.save(f, data)
+        self._save_data_npy(data, validity)
 
         # return data dict
         return data
@@ -235,38 +1703,193 @@ class McapReader:
     def __init__(self):
         self._mcap_file: Optional[io.BufferedReader] = None
         self._reader: Optional[mcap.reader.McapReader] = None
+        self._summary: Optional[mcap.summary.Summary] = None
         self._mcap_topics = {}
         self._topic_lut = {}
         self._mcap_path = None
+        self._numpy_dir = None
+        self._compact = False
+        self._progress = print_progress
+        self._metrics = DecodeMetrics()
 
-    def open(self, mcap_path: str):
+    def open(self, mcap_path: str, numpy_dir: Optional[str] = None, compact: bool = False):
+        """
+        Opens an mcap file. Decoded topics are cached in numpy_dir, default is the numpy folder next to the file.
+        With compact=True topics are stored with narrower dtypes, see _compact_data and McapTopic.get_categories.
+        """
         self._mcap_path = Path(mcap_path)
+        self._compact = compact
+        self._numpy_dir = None if numpy_dir is None else Path(numpy_dir)
         self._mcap_file = open(self._mcap_path, "rb")
         self._reader = make_reader(self._mcap_file)
 
-        for k, v in self._reader.get_summary().channels.items():
-            try:
-                self._mcap_topics[k] = McapTopic(self._reader, self._mcap_path, k)
+        # read the summary once, topics are created on first access, see get_topic
+        try:
+            self._summary = self._reader.get_summary()
+        except McapError:
+            # no footer, e.g. a recording cut off by a crash or power loss
+            self._summary = None
+        if self._summary is None or self._summary.statistics is None:
+            self._summary = self._recover_summary()
+        self._mcap_topics = {}
+        self._topic_lut = {}
+        message_counts = self._summary.statistics.channel_message_counts
+        for k, v in self._summary.channels.items():
+            if k in message_counts and v.schema_id in self._summary.schemas:
                 self._topic_lut[v.topic] = k
-            except KeyError:
+            else:
                 print(f"[Warning] Empty topic {v.topic} found.")
 
+    def _index_file(self):
+        numpy_dir = self._mcap_path.parent / "numpy" if self._numpy_dir is None else self._numpy_dir
+        return numpy_dir / (self._mcap_path.stem + ".index")
+
+    def _recover_summary(self):
+        """
+        Rebuilds the summary of a file without summary section by scanning its data section once
+        and keeps it in a sidecar index next to the numpy cache. Later opens only scan what was appended since.
+        """
+        index_file = self._index_file()
+        file_size = os.path.getsize(self._mcap_path)
+        summary, offset = _read_index(index_file, self._mcap_file, file_size)
+        if summary is None:
+            print(f"[Warning] No summary in {self._mcap_path.name}, rebuilding index {index_file}")
+
+        summary, scanned_offset = _scan_summary(self._mcap_file, file_size, summary, offset)
+        if scanned_offset != offset or not os.path.exists(index_file):
+            _write_index(index_file, self._mcap_file, summary, scanned_offset)
+
+        # read messages through the chunk indexes of the rebuilt summary
+        self._reader = _IndexedReader(self._mcap_file, summary)
+        return summary
+
     def close(self):
         if self._mcap_file is not None:
             self._mcap_file.close()
             self._reader = None
 
     def get_topics(self):
-        return [x.topic for x in self._reader.get_summary().channels.values()]
+        return [x.topic for x in self._summary.channels.values()]
 
     def get_total_message_count(self):
-        return self._reader.get_summary().statistics.message_count
+        return self._summary.statistics.message_count
+
+    def get_topic(self, topic: str):
+        """
+        Returns the McapTopic of a topic name, parsing its schema on first access.
+        Raises a KeyError for unknown or empty topics.
+        """
+        topic_key = self._topic_lut[topic]
+        if topic_key not in self._mcap_topics:
+            self._mcap_topics[topic_key] = McapTopic(self._reader, self._mcap_path, topic_key, self._numpy_dir,
+                                                     self._compact, self._progress, self._metrics)
+        return self._mcap_topics[topic_key]
+
+    def set_progress(self, progress=print_progress):
+        """
+        Sets the progress callback of all topics, called as progress(topic, count, total, note)
+        while decoding and when data is loaded. None disables progress output.
+        """
+        self._progress = progress
+        for mcap_topic in self._mcap_topics.values():
+            mcap_topic._progress = progress
+
+    def get_metrics(self):
+        """
+        Returns the DecodeMetrics collected by all topics of this reader, see DecodeMetrics.get_summary.
+        """
+        return self._metrics
+
+    def reset_metrics(self):
+        self._metrics = DecodeMetrics()
+        for mcap_topic in self._mcap_topics.values():
+            mcap_topic._metrics = self._metrics
 
     def get_data_list(self, topic: str):
-        return self._mcap_topics[self._topic_lut[topic]].get_data_list()
+        return self.get_topic(topic).get_data_list()
+
+    def get_columns(self, topic: str):
+        return self.get_topic(topic).get_columns()
+
+    def get_dataframe(self, topic: str):
+        return self.get_topic(topic).get_dataframe()
+
+    def get_data(self, topic: str, workers: int = 1, start_ns: Optional[int] = None, end_ns: Optional[int] = None,
+                 fields=None):
+        return self.get_topic(topic).get_data(workers, start_ns, end_ns, fields)
+
+    def iter_batches(self, topic: str, batch_size: int = DECODE_BLOCK_SIZE, fields=None):
+        return self.get_topic(topic).iter_batches(batch_size, fields)
+
+    def align(self, topics, grid=None, method: str = "asof", tolerance: Optional[int] = None, fields=None):
+        """
+        Returns the given topics joined onto one time grid as one wide structured array with ts and
+        <topic>_<field>, see mcap_align.align_arrays for grid, method and tolerance (grid default: 15 minutes).
+        fields optionally limits the fields per topic as dictionary of topic name to field list.
+        Works on the cached topic data, numbers become float64 with NaN where a topic has no valid sample,
+        invalid values (see McapTopic.get_validity) are skipped.
+        """
+        from mcap_align import align_arrays, SLOT_NS
+
+        arrays = {}
+        value_fields = {}
+        validity = {}
+        for topic in topics:
+            mcap_topic = self.get_topic(topic)
+            topic_fields = None if fields is None or topic not in fields else fields[topic]
+            arrays[topic] = mcap_topic.get_data(fields=topic_fields)
+            # compact string codes are no values to average or interpolate
+            value_fields[topic] = [x for x in arrays[topic].dtype.names
+                                   if x != "ts" and mcap_topic._field_dtypes[x] in ("number", "integer", "boolean")]
+            validity[topic] = mcap_topic.get_validity([x for x in value_fields[topic]
+                                                       if x in mcap_topic.get_value_fields()])
+
+        return align_arrays(arrays, SLOT_NS if grid is None else grid, method, tolerance, value_fields, validity)
+
+    def get_all_data(self, workers: Optional[int] = None):
+        """
+        Returns the data of all non-empty topics as a dictionary of topic name to numpy array.
+        Topics without cached numpy file are decoded at the same time in a process pool
+        of the given number of workers (default: number of cpus), each worker opening
+        its own file handle and reader and writing the numpy cache, which is then memory mapped.
+        workers=1 decodes all topics in this process.
+        """
+        topics = [x for x in self.get_topics() if x in self._topic_lut]
+        all_data = {}
+
+        # load cached topics directly, only decode the missing ones in the pool
+        uncached = []
+        for topic in topics:
+            if self.get_topic(topic).has_cached_data():
+                all_data[topic] = self.get_data(topic)
+            else:
+                uncached.append(topic)
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = min(workers, len(uncached))
+
+        if workers <= 1:
+            for topic in uncached:
+                all_data[topic] = self.get_data(topic)
+        else:
+            start = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                paths = [str(self._mcap_path)] * len(uncached)
+                numpy_dirs = [self._numpy_dir] * len(uncached)
+                compact = [self._compact] * len(uncached)
+                for topic, metrics in pool.map(_get_data_worker, paths, uncached, numpy_dirs, compact):
+                    # memory map the cache written by the worker instead of receiving the data
+                    self._metrics.merge(metrics)
+                    all_data[topic] = self.get_topic(topic)._load_data_npy()
+                    if all_data[topic] is None:
+                        all_data[topic] = self.get_data(topic)
+                    else:
+                        self.get_topic(topic)._report_progress(len(all_data[topic]), "decoded in worker")
+            self._metrics.add_wall_time(time.perf_counter() - start)
 
-    def get_data(self, topic: str):
-        return self._mcap_topics[self._topic_lut[topic]].get_data()
+        # return data in topic order
+        return {x: all_data[x] for x in topics}
 
     def print_info(self):
         info = "MCAP Info:\n"
@@ -275,7 +1898,7 @@ class McapReader:
 
         for topic in self.get_topics():
             try:
-                t = self._mcap_topics[self._topic_lut[topic]]
+                t = self.get_topic(topic)
                 info += "    " + topic + ":\n"
                 info += "      Messages: " + str(t.get_message_count()) + "\n"
                 info += "      Fields: " + str(t.get_fields()) + "\n"
@@ -287,6 +1910,41 @@ class McapReader:
         print(info)
 
 
+def _get_data_worker(mcap_path: str, topic: str, numpy_dir: Optional[str] = None, compact: bool = False):
+    """
+    Process pool worker of McapReader.get_all_data, decodes one topic with its own reader into the numpy cache.
+    Returns only the metrics, the parent memory maps the cache instead of receiving a pickled copy of the data.
+    """
+    mcap_reader = McapReader()
+    mcap_reader.open(mcap_path, numpy_dir, compact)
+    mcap_reader.set_progress(None)
+    try:
+        mcap_reader.get_data(topic)
+        return topic, mcap_reader.get_metrics()
+    finally:
+        mcap_reader.close()
+
+
+def _decode_chunks_worker(mcap_path: str, topic: str, chunk_indexes, np_struct_format,
+                          numpy_dir: Optional[str] = None):
+    """
+    Process pool worker of McapTopic.get_default_data_parallel, decodes a group of chunks with its own reader.
+    Opens the file with the numpy_dir of the parent, so a file without summary uses the index it already built.
+    """
+    mcap_reader = McapReader()
+    mcap_reader.open(mcap_path, numpy_dir)
+    try:
+        validity = []
+        mcap_topic = mcap_reader.get_topic(topic)
+        keys, blocks = mcap_topic._decode_chunks(chunk_indexes, np_struct_format, validity)
+        if validity:
+            validity = np.concatenate(validity)
+        else:
+            validity = np.ones((0,), dtype=[(x, np.bool_) for x in mcap_topic.get_value_fields(np_struct_format)])
+        return keys, blocks, validity, mcap_reader.get_metrics()
+    finally:
+        mcap_reader.close()
+
 
 if __name__ == '__main__':
     # Absolute path to your .mcap file
@@ -297,57 +1955,14 @@ if __name__ == '__main__':
     mcap_reader.open(file_path)
     mcap_reader.print_info()
 
-    import csv
-    import os
-    import datetime
+    from mcap_export import export_topics_csv
 
     # Output folder
     output_dir = r"C:\Users\TomiNordi2m\OneDrive - i2m Unternehmensentwicklung GmbH\Documents\E-Flex\converted_csv"
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Loop through all available topics
-    for topic_name in mcap_reader.get_topics():
-        print(f"\nProcessing topic: {topic_name}")
-        module_data = mcap_reader.get_data(topic_name)
-
-        output_file = os.path.join(output_dir, topic_name.replace("/", "_") + ".csv")
-
-        # Remove file if it exists
-        if os.path.exists(output_file):
-            os.remove(output_file)
-
-        with open(output_file, "w", newline="") as f:
-            writer = csv.writer(f)
-
-            # Header: add readable timestamp at the beginning
-            headers = list(module_data.dtype.names)
-            headers.insert(0, "timestamp")
-            writer.writerow(headers)
-
-            written_slots = set()
-
-            for row in module_data:
-                ts_ns = row["ts"]
-                ts_s = ts_ns / 1e9
-                dt = datetime.datetime.fromtimestamp(ts_s)
-
-                # Round down to nearest 15-minute interval
-                floored_minute = dt.minute - (dt.minute % 15)
-                slot_time = dt.replace(minute=floored_minute, second=0, microsecond=0)
-
-                if slot_time in written_slots:
-                    continue  # skip if this slot already written
-
-                # Write row
-                row_list = list(row)
-                row_list.insert(0, slot_time.strftime("%Y-%m-%d %H:%M"))
-                writer.writerow(row_list)
-                written_slots.add(slot_time)
-
-        print(f"✅ CSV saved: {os.path.abspath(output_file)}")
-
-
 
+    # Decode all topics in parallel and write the first sample of every 15-minute slot
+    # (use how="mean", "max" or "energy" for aggregated load profiles)
+    export_topics_csv(mcap_reader, output_dir, how="first")
 
     # Close reader
     mcap_reader.close()
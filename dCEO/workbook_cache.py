@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# version of the workbook cache layout, bump when it changes
+CACHE_VERSION = 2
+
+# file marking a folder as workbook cache while it is built, see _prepare_cache_dir
+CACHE_MARKER = ".building"
+
+# bytes read at once while hashing a workbook
+HASH_BLOCK_SIZE = 1 << 20
+
+# columns of the Summary sheets read by dCEO_Preassessment.ipynb
+DATETIME_COLUMN = "DateTime"
+LOAD_COLUMN = "Load Profile [kW]"
+PV_COLUMN = "PV Production [kW]"
+FEED_IN_COLUMN = "Grid Feed-in [kW]"
+GRID_COLUMN = "Grid Consumption [kW]"
+
+# power columns stored as float64, text and empty cells become NaN
+POWER_COLUMNS = (LOAD_COLUMN, PV_COLUMN, FEED_IN_COLUMN, GRID_COLUMN)
+
+
+def _file_hash(file_path: Path):
+    """
+    Returns the sha256 of the file content, the key of its cache.
+    """
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _prepare_cache_dir(cache_dir: Path):
+    """
+    Creates an empty cache_dir for a workbook cache. An existing folder is only replaced if it holds a manifest
+    or the marker of an interrupted build, any other non-empty folder raises FileExistsError.
+    """
+    if os.path.isdir(cache_dir) and os.listdir(cache_dir):
+        if not (os.path.exists(cache_dir / "manifest.json") or os.path.exists(cache_dir / CACHE_MARKER)):
+            raise FileExistsError(f"{cache_dir} is not empty and is no workbook cache, refusing to replace it")
+        shutil.rmtree(cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    open(cache_dir / CACHE_MARKER, 'w').close()
+
+
+def _typed_columns(df):
+    """
+    Returns the columns of a parsed sheet as dictionary of column name to (typed numpy array, dtype of the parsed
+    column, null mask or None): DateTime as datetime64, the power columns as float64, numbers and booleans
+    in their parsed dtype and everything else as text with the mask of its empty cells.
+    """
+    columns = {}
+    for name in df.columns:
+        column = df[name]
+        if name == DATETIME_COLUMN or column.dtype.kind == "M":
+            values = pd.to_datetime(column).to_numpy()
+            columns[str(name)] = (values, values.dtype.str, None)
+        elif name in POWER_COLUMNS:
+            values = pd.to_numeric(column, errors='coerce').to_numpy(dtype=np.float64)
+            columns[str(name)] = (values, values.dtype.str, None)
+        elif column.dtype.kind in "iufb":
+            values = column.to_numpy()
+            columns[str(name)] = (values, values.dtype.str, None)
+        else:
+            # text columns, object and str, are restored with their dtype and NaN for empty cells
+            values = column.fillna("").astype(str).to_numpy(dtype=str)
+            columns[str(name)] = (values, str(column.dtype), column.isna().to_numpy())
+    return columns
+
+
+def _restore_column(values, dtype: str, null):
+    """
+    Returns a cached column (see _typed_columns) with the dtype and the empty cells of the parsed column.
+    """
+    if null is None:
+        return values
+    return pd.Series(values).astype(dtype).mask(null)
+
+
+def build_workbook_cache(file_path: Path, cache_dir: Path, source_hash: Optional[str] = None):
+    """
+    Parses all sheets of a workbook once and stores every column as numpy file, replacing an existing cache
+    (see _prepare_cache_dir):
+        <cache_dir>/<sheet number>/<column number>.npy
+        <cache_dir>/<sheet number>/<column number>.null.npy (empty cells of text columns)
+        <cache_dir>/manifest.json
+    """
+    cache_dir = Path(cache_dir)
+    _prepare_cache_dir(cache_dir)
+
+    sheets = {}
+    excel_file = pd.ExcelFile(file_path)
+    for sheet_idx, sheet in enumerate(excel_file.sheet_names):
+        columns = _typed_columns(excel_file.parse(sheet))
+        os.makedirs(cache_dir / str(sheet_idx))
+        for column_idx, (values, _, null) in enumerate(columns.values()):
+            np.save(cache_dir / str(sheet_idx) / (str(column_idx) + ".npy"), values)
+            if null is not None:
+                np.save(cache_dir / str(sheet_idx) / (str(column_idx) + ".null.npy"), null)
+        sheets[sheet] = {"folder": str(sheet_idx),
+                         "columns": [(k, v[1], v[2] is not None) for k, v in columns.items()]}
+
+    # manifest last, an interrupted build leaves no valid cache
+    manifest = {"version": CACHE_VERSION, "source": str(file_path),
+                "source_sha256": _file_hash(file_path) if source_hash is None else source_hash, "sheets": sheets}
+    with open(cache_dir / "manifest.json", 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.remove(cache_dir / CACHE_MARKER)
+
+    return manifest
+
+
+def _read_manifest(cache_dir: Path):
+    """
+    Returns the manifest of a workbook cache, or None if there is no readable one.
+    """
+    manifest_file = Path(cache_dir) / "manifest.json"
+    if not os.path.exists(manifest_file):
+        return None
+
+    with open(manifest_file, 'r') as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return None
+
+
+def load_workbook(file_path: str, sheets=None, cache_dir: Optional[str] = None):
+    """
+    Returns the given sheets (default: all) of an Excel workbook as dictionary of sheet name to pandas DataFrame
+    with typed columns (see _typed_columns). The workbook is parsed once into a columnar cache,
+    default cache/<workbook name>/ next to it, and rebuilt when the content hash of the workbook changes.
+    """
+    file_path = Path(file_path)
+    if cache_dir is None:
+        cache_dir = file_path.parent / "cache" / file_path.stem
+    cache_dir = Path(cache_dir)
+
+    source_hash = _file_hash(file_path)
+    manifest = _read_manifest(cache_dir)
+    if manifest is None or manifest["version"] != CACHE_VERSION or manifest["source_sha256"] != source_hash:
+        manifest = build_workbook_cache(file_path, cache_dir, source_hash)
+
+    if sheets is None:
+        sheets = list(manifest["sheets"].keys())
+
+    dataframes = {}
+    for sheet in sheets:
+        if sheet not in manifest["sheets"]:
+            raise KeyError(f"Workbook {file_path.name} has no sheet {sheet}")
+        sheet_info = manifest["sheets"][sheet]
+        columns = {}
+        for column_idx, (name, dtype, has_null) in enumerate(sheet_info["columns"]):
+            column_file = cache_dir / sheet_info["folder"] / str(column_idx)
+            null = np.load(column_file.with_suffix(".null.npy")) if has_null else None
+            columns[name] = _restore_column(np.load(column_file.with_suffix(".npy")), dtype, null)
+        dataframes[sheet] = pd.DataFrame(columns, copy=False)
+
+    return dataframes
+
+
+def load_sheet(file_path: str, sheet: str = "Summary", cache_dir: Optional[str] = None):
+    """
+    Returns one sheet of an Excel workbook as pandas DataFrame like pd.ExcelFile(file_path).parse(sheet),
+    from the columnar cache of load_workbook. Dtypes and empty cells are kept, except that DateTime is always
+    datetime64, text in the power columns becomes NaN and numbers in mixed text columns become text.
+    """
+    return load_workbook(file_path, [sheet], cache_dir)[sheet]
+
+
+if __name__ == '__main__':
+    # usage: workbook_cache.py <workbook.xlsx> [sheet]
+    df = load_sheet(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "Summary")
+    print(df.dtypes)
+    print(df.head())